@@ -0,0 +1,52 @@
+import time
+import numpy as np
+import pandas as pd
+from Listing_Parsers import (
+    bathroom_type_mapping,
+    extract_bathroom_type,
+    extract_bathrooms_number,
+    parse_bathrooms_text,
+)
+
+#Micro-benchmark of the bathrooms_text parsing: row-wise apply functions vs vectorized parser
+#Run with: python Bathrooms_Benchmark.py
+n_rows = 3_000_000
+
+#Values seen in the Inside Airbnb listings (plus missing values)
+bathrooms_values = [
+    "1 bath", "2 baths", "1.5 baths", "2.5 baths", "3 baths", "1 private bath", "1 shared bath",
+    "1.5 shared baths", "2 shared baths", "Half-bath", "Shared half-bath", "Private half-bath",
+    "0 baths", "0 shared baths", "4 baths", "3.5 baths", None,
+]
+
+
+def current_parsing(bathrooms_text):
+    """
+    Parsing as done before in the listings script: two apply passes, the mapping and two fillna.
+    """
+    bathroom_number = bathrooms_text.apply(extract_bathrooms_number).fillna(1)
+    bathroom_type = bathrooms_text.apply(extract_bathroom_type).replace(bathroom_type_mapping).fillna("bath")
+    return bathroom_number, bathroom_type
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    bathrooms_text = pd.Series(rng.choice(np.array(bathrooms_values, dtype=object), size=n_rows))
+
+    (current_number, current_type), current_time = timed(current_parsing, bathrooms_text)
+    parsed, vectorized_time = timed(parse_bathrooms_text, bathrooms_text)
+
+    # Both versions must give the same results
+    pd.testing.assert_series_equal(parsed["bathroom_number"], current_number.astype("float64"), check_names=False)
+    pd.testing.assert_series_equal(parsed["bathroom_type"], current_type.astype("object"), check_names=False)
+
+    print(f"Rows: {n_rows:,}")
+    print(f"Current apply functions: {current_time:.2f} s")
+    print(f"Vectorized parser:       {vectorized_time:.2f} s")
+    print(f"Speed-up: {current_time / vectorized_time:.1f}x")
@@ -0,0 +1,97 @@
+import pandas as pd
+from Snapshot_Utils import snapshot_categories
+
+#Grains of the precomputed fact tables (name -> group keys)
+cube_grains = {
+    "listing_month": ["listing_id", "month"],
+    "neighbourhood_month": ["neighbourhood", "month"],
+    "room_type_quarter": ["room_type", "quarter"],
+}
+
+
+def latest_calendar_rows(calendar):
+    """
+    Keep one row per listing and day: when several snapshots cover it, the latest snapshot wins.
+    Snapshots are ordered as in the registry (the labels read back from the csv are plain strings).
+    """
+    if "snapshot" not in calendar.columns:
+        raise ValueError("The calendar has no snapshot column: the days covered by several snapshots cannot be deduplicated")
+    # Unknown snapshots get the code -1 and lose to the registered ones
+    order = calendar["snapshot"].astype("string").astype(snapshot_categories()).cat.codes.to_numpy()
+    calendar = calendar.iloc[order.argsort(kind="stable")]
+    calendar = calendar.drop_duplicates(subset=["listing_id", "date"], keep="last")
+    return calendar.reset_index(drop=True)
+
+
+def calendar_available(calendar):
+    """
+    Availability as a plain boolean column (the in-memory output still has "t"/"f").
+    """
+    available = calendar["available"]
+    if not pd.api.types.is_bool_dtype(available.dtype):
+        available = available.eq("t")
+    return available.fillna(False).astype(bool)
+
+
+def calendar_price(calendar):
+    """
+    Nightly price in dollars (the streaming output stores integer cents).
+    """
+    if "price_cents" in calendar.columns:
+        return calendar["price_cents"].astype("float64") / 100
+    return calendar["price"].astype("float64")
+
+
+def calendar_facts(calendar, listings):
+    """
+    Build the narrow per-day frame the cubes are aggregated from.
+    """
+    calendar = latest_calendar_rows(calendar)
+    available = calendar_available(calendar)
+    price = calendar_price(calendar)
+
+    # Latest known neighbourhood and room type of every listing
+    attributes = listings.drop_duplicates(subset="id", keep="last").set_index("id")
+    date = pd.to_datetime(calendar["date"])
+
+    return pd.DataFrame({
+        "listing_id": calendar["listing_id"],
+        "neighbourhood": calendar["listing_id"].map(attributes["neighbourhood_cleansed"]).fillna("Unknown"),
+        "room_type": calendar["listing_id"].map(attributes["room_type"]).fillna("Unknown"),
+        # Month and quarter of the calendar day (not of the snapshot)
+        "month": date.dt.to_period("M"),
+        "quarter": date.dt.to_period("Q"),
+        "available": available,
+        "price": price,
+        "booked_revenue": price.where(~available, 0),
+    })
+
+
+def aggregate_cube(facts, keys):
+    """
+    Occupancy, available nights, average/median nightly price and estimated revenue for one grain.
+    """
+    cube = facts.groupby(keys, observed=True).agg(
+        nights=("available", "size"),
+        available_nights=("available", "sum"),
+        average_price=("price", "mean"),
+        median_price=("price", "median"),
+        estimated_revenue=("booked_revenue", "sum"),
+    ).reset_index()
+
+    # A night that is not available is counted as booked
+    cube["booked_nights"] = cube["nights"] - cube["available_nights"]
+    cube["occupancy_rate"] = cube["booked_nights"] / cube["nights"]
+    for key in ["month", "quarter"]:
+        if key in keys:
+            cube[key] = cube[key].astype(str)
+    return cube
+
+
+def build_calendar_cubes(calendar, listings, grains=cube_grains):
+    """
+    Precompute the occupancy and revenue fact tables for every grain.
+    Returns a dictionary {grain name: fact table}.
+    """
+    facts = calendar_facts(calendar, listings)
+    return {name: aggregate_cube(facts, keys) for name, keys in grains.items()}
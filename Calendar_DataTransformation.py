@@ -1,80 +1,151 @@
+import sys
 import pandas as pd
-
+from Calendar_Cubes import build_calendar_cubes
+from Calendar_Matrix import build_calendar_matrix
+from Calendar_Streaming import stream_calendar
+from Columnar_Output import remove_parquet_snapshots, write_partitioned_parquet
+from Deduplication import deduplicate, print_report
+from Snapshot_Manifest import append_output, load_manifest, pending_files, record_files, remove_snapshots
+from Snapshot_Utils import load_snapshots
+
+#In chronological order: when snapshots overlap on a listing and day the last one is kept
 calendar_Files = [
     "Raw_Data/calendar_12-2023.csv",
-    "Raw_Data/calendar_06-2024.csv",
     "Raw_Data/calendar_03-2024.csv",
+    "Raw_Data/calendar_06-2024.csv",
     "Raw_Data/calendar_09-2024.csv"
 ]
 
-#Reading, importint and concatenating the csv files into a single dataframe
-dataframes_calendar = [pd.read_csv(file, low_memory=False) for file in calendar_Files]
-calendar_data = pd.concat(dataframes_calendar, ignore_index=True)
-
-#DATA INSPECTION
-print(calendar_data.info())
-print(calendar_data.shape)
-
-#CHECKING DUPLICATES 
-duplicate_count = calendar_data.duplicated().sum()
-print(f"Total duplicate rows: {duplicate_count}")
-
-# Display the duplicate rows
-duplicates = calendar_data[calendar_data.duplicated()]
-print("Duplicate rows:")
-print(duplicates)
-
-# Keep only the first occurrence
-review_data = calendar_data.drop_duplicates(keep="first")
-
-# Verify the result
-print(f"Rows after keeping the first occurrence of duplicates: {len(review_data)}")
-
-#Changing data types 
-# Remove dollar signs and commas, then convert to numeric type
-calendar_data['price'] = pd.to_numeric(calendar_data['price'].str.replace('$', '', regex=False).str.replace(',', '', regex=False))
-calendar_data['adjusted_price'] = pd.to_numeric(calendar_data['adjusted_price'].str.replace('$', '', regex=False).str.replace(',', '', regex=False))
-
-#Changing date into datetime
-calendar_data['date'] = pd.to_datetime(calendar_data['date'])
-
-# Verify data types
-print("\nData types:")
-print(calendar_data.dtypes)
-
-#CHECKING MISSING VALUES 
-print(calendar_data.isna().sum())
-# Filter dataset
-filtered_data = calendar_data[calendar_data['adjusted_price'].notna()]
-
-# Analyze the 'price' column for these rows
-price_values = filtered_data[['price', "adjusted_price"]]
-
-# Summary statistics
-print(price_values.describe())
-#Following analysis we can safely delete the adjusted price 
-#The values are the same in the price column
-calendar_data = calendar_data.drop(columns="adjusted_price")
-
-#CHECKING Minimum/maximum night missing values 
-print(calendar_data[["minimum_nights", "maximum_nights"]].isna().sum())
-
-# Check for empty strings or unexpected placeholders
-print(calendar_data[calendar_data['minimum_nights'] == ''])
-print(calendar_data[calendar_data['maximum_nights'] == ''])
-
-# Remove rows where 'nights' is missing
-calendar_data_cleaned = calendar_data.dropna(subset=['minimum_nights', 'maximum_nights'])
-
-# Calculate removed rows
-removed_rows = len(calendar_data) - len(calendar_data_cleaned)
-print(f"\nNumber of removed rows: {removed_rows}")
-
-#LAST DATA VALIDATION
-print(calendar_data_cleaned.info())
-print(calendar_data_cleaned.shape)
-print(calendar_data_cleaned.isna().sum())
-
-#transforming the dataframe into csv 
-calendar_data_cleaned.to_csv("calendar_data.csv", index=False)
+#STREAMING MODE: read each file in bounded chunks with an explicit dtype schema and
+#write every cleaned chunk straight to the csv (prices in cents, available as boolean)
+#The two modes write different columns: incremental runs must keep the mode that built calendar_data.csv
+streaming_mode = False
+chunk_size = 1_000_000
+
+#COLUMNAR OUTPUT: also write a Parquet dataset partitioned by snapshot quarter
+columnar_output = False
+parquet_path = "calendar_data.parquet" if columnar_output else None
+
+#Number of worker processes parsing the snapshot files (None = one per file on Linux, sequential on Windows/macOS
+#where the workers would re-import this script; 1 = sequential)
+load_workers = None
+
+#OCCUPANCY AND REVENUE CUBES: precomputed fact tables for the dashboard
+#(needs the listings output for the neighbourhood and room type of each listing)
+build_cubes = False
+cube_listing_file = "listing_data_actice.csv"
+
+#LISTING X DAY MATRIX STORE: memory-mapped NumPy matrices (availability bits, price in cents, nights)
+build_matrix = False
+matrix_directory = "calendar_matrix"
+
+#INCREMENTAL MODE: only parse the new or changed snapshots (tracked by content hash in
+#snapshot_manifest.json) and add them to the existing outputs
+incremental_mode = False
+calendar_outputs = ["calendar_data.csv"] + ([parquet_path] if columnar_output else [])
+
+if incremental_mode:
+    calendar_Files, changed_snapshots = pending_files(calendar_Files, load_manifest())
+    if not calendar_Files:
+        print("No new or changed calendar snapshot to process")
+        sys.exit()
+    # The previous rows of a changed snapshot are replaced
+    remove_snapshots("calendar_data.csv", changed_snapshots)
+    if columnar_output:
+        remove_parquet_snapshots(parquet_path, changed_snapshots)
+    print(f"Processing {len(calendar_Files)} new or changed calendar snapshot(s): {calendar_Files}")
+
+if streaming_mode:
+    stream_calendar(calendar_Files, "calendar_data.csv", chunk_size=chunk_size, parquet_path=parquet_path, append=incremental_mode)
+else:
+    #Reading, importint and concatenating the csv files in parallel (tagged with their snapshot and quarter)
+    calendar_data = load_snapshots(calendar_Files, max_workers=load_workers, low_memory=False)
+
+    #DATA INSPECTION
+    print(calendar_data.info())
+    print(calendar_data.shape)
+
+    #CHECKING DUPLICATES on the natural key (listing_id, date), hashed once
+    #Rows of the same day in several snapshots conflict when availability or price changed, the latest snapshot is kept
+    duplicate_report, calendar_data = deduplicate(calendar_data, ["listing_id", "date"], keep="last")
+    print_report(duplicate_report, "calendar")
+
+    #Changing data types 
+    # Remove dollar signs and commas, then convert to numeric type
+    calendar_data['price'] = pd.to_numeric(calendar_data['price'].str.replace('$', '', regex=False).str.replace(',', '', regex=False))
+    calendar_data['adjusted_price'] = pd.to_numeric(calendar_data['adjusted_price'].str.replace('$', '', regex=False).str.replace(',', '', regex=False))
+
+    #Changing date into datetime
+    calendar_data['date'] = pd.to_datetime(calendar_data['date'])
+
+    # Verify data types
+    print("\nData types:")
+    print(calendar_data.dtypes)
+
+    #CHECKING MISSING VALUES 
+    print(calendar_data.isna().sum())
+    # Filter dataset
+    filtered_data = calendar_data[calendar_data['adjusted_price'].notna()]
+
+    # Analyze the 'price' column for these rows
+    price_values = filtered_data[['price', "adjusted_price"]]
+
+    # Summary statistics
+    print(price_values.describe())
+    #Following analysis we can safely delete the adjusted price 
+    #The values are the same in the price column
+    calendar_data = calendar_data.drop(columns="adjusted_price")
+
+    #CHECKING Minimum/maximum night missing values 
+    print(calendar_data[["minimum_nights", "maximum_nights"]].isna().sum())
+
+    # Check for empty strings or unexpected placeholders
+    print(calendar_data[calendar_data['minimum_nights'] == ''])
+    print(calendar_data[calendar_data['maximum_nights'] == ''])
+
+    # Remove rows where 'nights' is missing
+    calendar_data_cleaned = calendar_data.dropna(subset=['minimum_nights', 'maximum_nights'])
+
+    # Calculate removed rows
+    removed_rows = len(calendar_data) - len(calendar_data_cleaned)
+    print(f"\nNumber of removed rows: {removed_rows}")
+
+    #LAST DATA VALIDATION
+    print(calendar_data_cleaned.info())
+    print(calendar_data_cleaned.shape)
+    print(calendar_data_cleaned.isna().sum())
+
+    #transforming the dataframe into csv 
+    if incremental_mode:
+        append_output(calendar_data_cleaned, "calendar_data.csv")
+    else:
+        calendar_data_cleaned.to_csv("calendar_data.csv", index=False)
+    if columnar_output:
+        write_partitioned_parquet(calendar_data_cleaned, parquet_path, append=incremental_mode)
+
+#Keeping track of the processed snapshots for the next incremental run
+record_files(calendar_Files, calendar_outputs)
+
+#Only the columns needed by the cubes and the matrix store are read back from the written output
+#(in streaming or incremental mode the full cleaned calendar is not in memory),
+#with the snapshot to keep the latest row of the days covered by several snapshots
+if (streaming_mode or incremental_mode) and (build_cubes or build_matrix):
+    calendar_data_cleaned = pd.read_csv(
+        "calendar_data.csv",
+        usecols=lambda col: col in ["listing_id", "date", "available", "price", "price_cents", "minimum_nights", "maximum_nights", "snapshot", "quarter"],
+        parse_dates=["date"],
+    )
+
+#PRECOMPUTING THE OCCUPANCY AND REVENUE CUBES
+if build_cubes:
+    cube_listings = pd.read_csv(cube_listing_file, usecols=["id", "neighbourhood_cleansed", "room_type", "quarter"])
+    cube_listings = cube_listings.sort_values("quarter", kind="stable")
+    for cube_name, cube in build_calendar_cubes(calendar_data_cleaned, cube_listings).items():
+        print(f"{cube_name}: {cube.shape}")
+        cube.to_csv(f"calendar_cube_{cube_name}.csv", index=False)
+
+#BUILDING THE LISTING X DAY MATRIX STORE (read it with Calendar_Matrix.open_calendar_matrix)
+if build_matrix:
+    matrix_shape = build_calendar_matrix(calendar_data_cleaned, matrix_directory)
+    print(f"Calendar matrix (listings x days): {matrix_shape}")
 
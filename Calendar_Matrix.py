@@ -0,0 +1,133 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from Calendar_Cubes import calendar_available, calendar_price, latest_calendar_rows
+
+#Value stored in the price and nights matrices for days without a calendar row
+missing_value = -1
+
+
+def build_calendar_matrix(calendar, directory):
+    """
+    Store the cleaned calendar as dense listing x day matrices (NumPy files) in a directory:
+    - listing_ids.npy: sorted listing ids, the row of a listing is its position in this array
+    - available.npy / observed.npy: availability and "has a calendar row" bits, packed 8 days per byte
+    - price_cents.npy (int32), minimum_nights.npy (int16), maximum_nights.npy (int32)
+    - meta.json: first date and number of days (the column of a day is its offset from the first date)
+    """
+    os.makedirs(directory, exist_ok=True)
+    calendar = latest_calendar_rows(calendar)
+
+    listing_ids, rows = np.unique(calendar["listing_id"].to_numpy(), return_inverse=True)
+    dates = pd.to_datetime(calendar["date"]).dt.normalize()
+    start_date = dates.min()
+    days = (dates - start_date).dt.days.to_numpy()
+    shape = (len(listing_ids), int(days.max()) + 1)
+
+    np.save(os.path.join(directory, "listing_ids.npy"), listing_ids.astype("int64"))
+
+    # Bit matrices are filled in memory (1 byte per cell) and packed before saving
+    observed = np.zeros(shape, dtype=bool)
+    observed[rows, days] = True
+    np.save(os.path.join(directory, "observed.npy"), np.packbits(observed, axis=1))
+    observed[rows, days] = calendar_available(calendar).to_numpy()
+    np.save(os.path.join(directory, "available.npy"), np.packbits(observed, axis=1))
+    del observed
+
+    price_cents = (calendar_price(calendar) * 100).round().fillna(missing_value).astype("int32")
+    values = {
+        "price_cents": (price_cents, "int32"),
+        "minimum_nights": (calendar["minimum_nights"].clip(upper=np.iinfo("int16").max), "int16"),
+        "maximum_nights": (calendar["maximum_nights"].clip(upper=np.iinfo("int32").max), "int32"),
+    }
+    for name, (column, dtype) in values.items():
+        # Written straight into the memory-mapped file instead of a full matrix in RAM
+        matrix = np.lib.format.open_memmap(os.path.join(directory, f"{name}.npy"), mode="w+", dtype=dtype, shape=shape)
+        matrix[:] = missing_value
+        matrix[rows, days] = column.fillna(missing_value).to_numpy(dtype=dtype)
+        matrix.flush()
+        del matrix
+
+    with open(os.path.join(directory, "meta.json"), "w") as f:
+        json.dump({"start_date": start_date.strftime("%Y-%m-%d"), "days": shape[1]}, f)
+    return shape
+
+
+def open_calendar_matrix(directory):
+    """
+    Open the matrices written by build_calendar_matrix as memory-mapped (read-only) arrays.
+    Nothing is loaded until a slice of an array is used.
+    """
+    with open(os.path.join(directory, "meta.json")) as f:
+        meta = json.load(f)
+
+    matrix = {"start_date": pd.Timestamp(meta["start_date"]), "days": meta["days"]}
+    for name in ["listing_ids", "available", "observed", "price_cents", "minimum_nights", "maximum_nights"]:
+        matrix[name] = np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+    return matrix
+
+
+def listing_rows(matrix, listing_ids):
+    """
+    Row of each listing id in the matrices (-1 for unknown ids).
+    """
+    listing_ids = np.atleast_1d(np.asarray(listing_ids, dtype="int64"))
+    rows = np.searchsorted(matrix["listing_ids"], listing_ids)
+    rows = np.minimum(rows, len(matrix["listing_ids"]) - 1)
+    return np.where(matrix["listing_ids"][rows] == listing_ids, rows, -1)
+
+
+def day_window(matrix, start=None, days=None):
+    """
+    Column range [first, last) of a date window, clipped to the stored days
+    (empty, first == last, when the window is entirely outside them).
+    """
+    first = 0 if start is None else (pd.Timestamp(start).normalize() - matrix["start_date"]).days
+    last = matrix["days"] if days is None else first + days
+    first = min(max(first, 0), matrix["days"])
+    return first, max(min(last, matrix["days"]), first)
+
+
+def unpack_window(bits, first, last):
+    """
+    Unpack only the bytes covering the day window of a packed bit matrix.
+    """
+    packed = bits[..., first // 8:(last + 7) // 8]
+    offset = first - (first // 8) * 8
+    return np.unpackbits(packed, axis=-1)[..., offset:offset + last - first].astype(bool)
+
+
+def listing_availability(matrix, listing_id, start=None, days=90):
+    """
+    Availability of one listing over a date window, e.g. the next 90 days.
+    Days without a calendar row are reported as not available.
+    """
+    row = listing_rows(matrix, listing_id)[0]
+    if row < 0:
+        raise KeyError(f"Unknown listing id: {listing_id}")
+    first, last = day_window(matrix, start, days)
+    return pd.Series(
+        unpack_window(matrix["available"][row], first, last),
+        index=pd.date_range(matrix["start_date"] + pd.Timedelta(days=first), periods=last - first, name="date"),
+        name="available",
+    )
+
+
+def booked_share(matrix, listing_groups, start=None, days=None):
+    """
+    Share of booked nights (observed and not available) per group over a date window.
+    listing_groups maps listing id -> group (e.g. neighbourhood_cleansed).
+    """
+    first, last = day_window(matrix, start, days)
+    observed = unpack_window(matrix["observed"], first, last)
+    booked = observed & ~unpack_window(matrix["available"], first, last)
+
+    per_listing = pd.DataFrame({
+        "group": pd.Series(listing_groups).reindex(matrix["listing_ids"]).to_numpy(),
+        "observed_nights": observed.sum(axis=1),
+        "booked_nights": booked.sum(axis=1),
+    })
+    share = per_listing.groupby("group").sum()
+    share["booked_share"] = share["booked_nights"] / share["observed_nights"]
+    return share
@@ -0,0 +1,149 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from Columnar_Output import write_partitioned_parquet
+from Snapshot_Utils import quarter_categories, snapshot_categories, tag_snapshot
+
+#Explicit schema for the raw calendar csv files
+#Prices stay as text here because of the "$1,234.00" format, they are parsed into cents per chunk
+calendar_dtypes = {
+    "listing_id": "int64",
+    "date": "string",
+    "available": "string",
+    "price": "string",
+    "adjusted_price": "string",
+    "minimum_nights": "Int32",
+    "maximum_nights": "Int32",
+}
+
+#Schema of the streamed output csv, read back chunk by chunk by the deduplication pass
+streamed_dtypes = {
+    "listing_id": "int64",
+    "date": "string",
+    "available": "boolean",
+    "minimum_nights": "Int32",
+    "maximum_nights": "Int32",
+    "price_cents": "Int32",
+    "snapshot": "string",
+    "quarter": "string",
+}
+
+
+def price_to_cents(prices):
+    """
+    Convert a "$1,234.50" price column into nullable integer cents.
+    """
+    dollars = pd.to_numeric(
+        prices.str.replace("$", "", regex=False).str.replace(",", "", regex=False),
+        errors="coerce",
+    )
+    return (dollars * 100).round().astype("Int32")
+
+
+def clean_calendar_chunk(chunk):
+    """
+    Apply the calendar cleaning steps to one chunk of raw rows.
+    Rows with missing nights are kept: as in the in-memory path they are removed after the deduplication.
+    """
+    chunk["date"] = pd.to_datetime(chunk["date"], format="%Y-%m-%d")
+    chunk["available"] = chunk["available"].map({"t": True, "f": False}).astype("boolean")
+    chunk["price_cents"] = price_to_cents(chunk["price"])
+
+    #adjusted_price is identical to price (see the analysis in Calendar_DataTransformation.py)
+    return chunk.drop(columns=["price", "adjusted_price"])
+
+
+def latest_rows(output_file, chunk_size=1_000_000):
+    """
+    Boolean mask of the output rows to keep: the row of the latest snapshot for every (listing_id, date).
+    Only the key columns are read (chunk by chunk), so memory grows with the number of rows, not their width.
+    """
+    keys = pd.concat(
+        (
+            pd.DataFrame({
+                "listing_id": chunk["listing_id"],
+                "date": pd.to_datetime(chunk["date"], format="%Y-%m-%d"),
+                "snapshot": chunk["snapshot"].astype(snapshot_categories()).cat.codes,
+            })
+            for chunk in pd.read_csv(output_file, usecols=["listing_id", "date", "snapshot"], dtype=streamed_dtypes, chunksize=chunk_size)
+        ),
+        ignore_index=True,
+    )
+    # Stable sort on the registry order: within a snapshot the last row of a key wins, as in the in-memory path
+    order = keys["snapshot"].to_numpy().argsort(kind="stable")
+    superseded = np.empty(len(keys), dtype=bool)
+    superseded[order] = keys.iloc[order].duplicated(subset=["listing_id", "date"], keep="last").to_numpy()
+    return ~superseded
+
+
+def keep_latest_rows(output_file, chunk_size=1_000_000, parquet_path=None):
+    """
+    Rewrite the streamed csv without the rows superseded by a later snapshot and the rows with missing nights,
+    so it holds the same rows as the in-memory output. The Parquet dataset is rebuilt from the kept rows.
+    Returns the number of rows kept and removed.
+    """
+    keep = latest_rows(output_file, chunk_size)
+    if parquet_path is not None:
+        shutil.rmtree(parquet_path, ignore_errors=True)
+
+    temporary = f"{output_file}.tmp"
+    position = 0
+    rows_kept = 0
+    reader = pd.read_csv(output_file, dtype=streamed_dtypes, chunksize=chunk_size)
+    for chunk_number, chunk in enumerate(reader):
+        chunk_keep = keep[position:position + len(chunk)]
+        position += len(chunk)
+        chunk = chunk[chunk_keep].dropna(subset=["minimum_nights", "maximum_nights"])
+        chunk = chunk.astype({"minimum_nights": "int32", "maximum_nights": "int32"})
+        chunk["date"] = pd.to_datetime(chunk["date"], format="%Y-%m-%d")
+        chunk.to_csv(temporary, mode="a" if chunk_number else "w", header=chunk_number == 0, index=False)
+        if parquet_path is not None:
+            chunk["quarter"] = chunk["quarter"].astype(quarter_categories())
+            write_partitioned_parquet(chunk, parquet_path, part_name=f"chunk{chunk_number}", append=True)
+        rows_kept += len(chunk)
+    os.replace(temporary, output_file)
+    return rows_kept, len(keep) - rows_kept
+
+
+def stream_calendar(files, output_file, chunk_size=1_000_000, parquet_path=None, append=False):
+    """
+    Read each calendar file in chunks, clean every chunk and append it to the output csv.
+    The rows superseded by a later snapshot are then dropped by a second pass over the csv (keep_latest_rows).
+    Peak memory stays around one chunk plus the key columns, whatever the number of files.
+    When parquet_path is given a Parquet dataset partitioned by quarter is written from the kept rows.
+    With append the existing outputs are kept and the new snapshots are added to them, in the column order
+    of the existing csv; a csv written by the in-memory path (price in dollars, available as "t"/"f") is refused.
+    Returns the number of rows read and the number of rows in the output csv.
+    """
+    if not append:
+        if os.path.exists(output_file):
+            os.remove(output_file)
+        if parquet_path is not None:
+            shutil.rmtree(parquet_path, ignore_errors=True)
+
+    # Columns of the csv the chunks are appended to (None: the csv is created with the first chunk)
+    existing_columns = pd.read_csv(output_file, nrows=0).columns if os.path.exists(output_file) else None
+    rows_read = 0
+    for file in files:
+        reader = pd.read_csv(file, dtype=calendar_dtypes, usecols=list(calendar_dtypes), chunksize=chunk_size)
+        for chunk in reader:
+            rows_read += len(chunk)
+            cleaned = tag_snapshot(clean_calendar_chunk(chunk), file)
+            if existing_columns is None:
+                cleaned.to_csv(output_file, index=False)
+                existing_columns = cleaned.columns
+            elif set(existing_columns) != set(cleaned.columns):
+                raise ValueError(
+                    f"{output_file} has the columns {list(existing_columns)}, not the streaming schema "
+                    f"{list(cleaned.columns)}: rebuild it in streaming mode before appending to it"
+                )
+            else:
+                cleaned.reindex(columns=existing_columns).to_csv(output_file, mode="a", header=False, index=False)
+        print(f"Streamed {file}: {rows_read} rows read so far")
+
+    if existing_columns is None:
+        return rows_read, 0
+    rows_written, rows_removed = keep_latest_rows(output_file, chunk_size=chunk_size, parquet_path=parquet_path)
+    print(f"Number of removed rows (superseded by a later snapshot or missing nights): {rows_removed}")
+    return rows_read, rows_written
@@ -0,0 +1,94 @@
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from Calendar_Streaming import stream_calendar
+from Deduplication import deduplicate
+from Snapshot_Utils import load_snapshot_registry, load_snapshots
+
+#Check that the streaming mode of Calendar_DataTransformation.py writes the same calendar table as the in-memory mode,
+#on synthetic snapshots that overlap on most listing days (with changed availability and prices, and missing nights)
+#Run with: python Calendar_Streaming_Test.py
+n_listings = 200
+n_days = 365
+test_chunk_size = 50_000
+
+
+def write_synthetic_snapshots(directory, rng):
+    """
+    One raw calendar file per registered snapshot, covering n_days from its scrape date. Returns the files.
+    """
+    files = []
+    listing_ids = rng.choice(np.arange(10**6, 10**18, 10**12, dtype=np.int64), size=n_listings, replace=False)
+    for snapshot, scraped in zip(load_snapshot_registry()["snapshot"], load_snapshot_registry()["scraped_from"]):
+        days = pd.date_range(scraped, periods=n_days).strftime("%Y-%m-%d")
+        n_rows = n_listings * n_days
+        minimum_nights = rng.integers(1, 30, n_rows).astype("float64")
+        minimum_nights[rng.random(n_rows) < 0.01] = np.nan
+        prices = [f"${price:,.2f}" for price in rng.integers(3000, 250000, n_rows) / 100]
+        file = os.path.join(directory, f"calendar_{snapshot}.csv")
+        pd.DataFrame({
+            "listing_id": np.repeat(listing_ids, n_days),
+            "date": np.tile(days, n_listings),
+            "available": rng.choice(["t", "f"], n_rows),
+            "price": prices,
+            "adjusted_price": None,
+            "minimum_nights": minimum_nights,
+            "maximum_nights": rng.integers(30, 1125, n_rows),
+        }).to_csv(file, index=False)
+        files.append(file)
+    return files
+
+
+def in_memory_calendar(files):
+    """
+    Cleaning steps of the in-memory path of Calendar_DataTransformation.py.
+    """
+    calendar_data = load_snapshots(files, max_workers=1, low_memory=False)
+    _, calendar_data = deduplicate(calendar_data, ["listing_id", "date"], keep="last")
+    calendar_data["price"] = pd.to_numeric(calendar_data["price"].str.replace("$", "", regex=False).str.replace(",", "", regex=False))
+    calendar_data["date"] = pd.to_datetime(calendar_data["date"])
+    calendar_data = calendar_data.drop(columns="adjusted_price")
+    return calendar_data.dropna(subset=["minimum_nights", "maximum_nights"])
+
+
+def comparable(calendar):
+    """
+    Calendar csv read back in one common form (price in cents, available as boolean, integer nights).
+    """
+    price_cents = calendar["price_cents"] if "price_cents" in calendar.columns else (calendar["price"] * 100).round()
+    available = calendar["available"]
+    if not pd.api.types.is_bool_dtype(available.dtype):
+        available = available.eq("t")
+    return pd.DataFrame({
+        "listing_id": calendar["listing_id"].astype("int64"),
+        "date": calendar["date"].astype(str),
+        "available": available.astype(bool),
+        "price_cents": price_cents.astype("int64"),
+        "minimum_nights": calendar["minimum_nights"].astype("int64"),
+        "maximum_nights": calendar["maximum_nights"].astype("int64"),
+        "snapshot": calendar["snapshot"].astype(str),
+        "quarter": calendar["quarter"].astype(str),
+    })
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as directory:
+        files = write_synthetic_snapshots(directory, np.random.default_rng(0))
+        in_memory_file = os.path.join(directory, "calendar_data_in_memory.csv")
+        streamed_file = os.path.join(directory, "calendar_data_streamed.csv")
+
+        in_memory_calendar(files).to_csv(in_memory_file, index=False)
+        stream_calendar(files, streamed_file, chunk_size=test_chunk_size)
+        # Incremental run: the last snapshot streamed into the output of the first ones
+        incremental_file = os.path.join(directory, "calendar_data_incremental.csv")
+        stream_calendar(files[:-1], incremental_file, chunk_size=test_chunk_size)
+        stream_calendar(files[-1:], incremental_file, chunk_size=test_chunk_size, append=True)
+
+        expected = comparable(pd.read_csv(in_memory_file, low_memory=False))
+        for file in [streamed_file, incremental_file]:
+            streamed = comparable(pd.read_csv(file, low_memory=False))
+            assert not streamed.duplicated(subset=["listing_id", "date"]).any()
+            pd.testing.assert_frame_equal(streamed, expected)
+        print(f"Streaming (full and incremental) and in-memory calendar outputs are identical: {len(expected):,} rows "
+              f"from {len(files) * n_listings * n_days:,} raw rows")
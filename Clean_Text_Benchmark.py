@@ -0,0 +1,65 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+from Review_Text import clean_comments, clean_comments_parallel, clean_text
+
+#Throughput benchmark of the review comment cleaning: row-wise clean_text apply vs fused cleaner (1 to N cores)
+#Run with: python Clean_Text_Benchmark.py
+n_comments = 400_000
+fuzz_comments = 200_000
+
+#Pieces of comments seen in the Inside Airbnb reviews (HTML line breaks, numbers, accents, emojis...)
+comment_pieces = [
+    "Great place to stay!", "The host was very responsive.", "Appartement très propre, bien situé.",
+    "Séjour agréable, je recommande", "<br/>", "<br>", "Check-in at 3pm, 2 nights.", "10/10 would stay again",
+    "Nice view 😍", "Très belle vue à côté du métro", "Die Wohnung war sehr schön.", "Muy buena ubicación",
+    "Ｆｕｌｌｗｉｄｔｈ text", "ｆｉ ligature ﬁne", "tab\tand\nnew line", "  extra   spaces  ", "AT&T; $120 CAD",
+    "Café crème", "Ελληνικά", "中文评论", "١٢٣ arabic digits", "Non breaking", "x² + y³", "<b>bold</b>",
+]
+#Characters mixed at random in the fuzz test (tags, Unicode digits and whitespace, compatibility forms...)
+fuzz_characters = list(
+    "aZ09 .,!?<>/éÉèçÇôûâ\t\n\r\x0b\x0c\x1c\x1f\x85\xa0  　"
+    "²³¹½ﬁＡａ１٣۴०𝟘ℌ№™€ŉǅİıßẞ😀́̈è"
+)
+
+
+def synthetic_comments(n, rng):
+    pieces = np.array(comment_pieces, dtype=object)
+    counts = rng.integers(1, 12, size=n)
+    return pd.Series([" ".join(rng.choice(pieces, size=count)) for count in counts])
+
+
+def fuzz_check(n, rng):
+    """
+    Random strings built from tricky characters must be cleaned exactly as clean_text does.
+    """
+    characters = np.array(fuzz_characters, dtype=object)
+    for _ in range(n):
+        comment = "".join(rng.choice(characters, size=rng.integers(0, 40)))
+        assert clean_comments([comment])[0] == clean_text(comment), repr(comment)
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    fuzz_check(fuzz_comments, rng)
+    print(f"Fuzz test: {fuzz_comments:,} random comments cleaned as clean_text")
+
+    comments = synthetic_comments(n_comments, rng)
+    reference, reference_time = timed(comments.apply, clean_text)
+    print(f"Comments: {n_comments:,}")
+    print(f"clean_text apply:     {n_comments / reference_time:>10,.0f} comments/s")
+
+    cores = sorted({1, 2, 4, os.cpu_count() or 1})
+    for workers in cores:
+        cleaned, cleaning_time = timed(clean_comments_parallel, comments, max_workers=workers)
+        # Both versions must give the same results
+        pd.testing.assert_series_equal(cleaned, reference, check_names=False)
+        print(f"Fused, {workers:>2} core(s):    {n_comments / cleaning_time:>10,.0f} comments/s "
+              f"({reference_time / cleaning_time:.1f}x)")
@@ -0,0 +1,58 @@
+import os
+import shutil
+import pandas as pd
+
+
+def to_columnar_types(df, max_category_ratio=0.5):
+    """
+    Store low-cardinality text columns as categoricals before writing.
+    Boolean and datetime columns are kept as they are.
+    """
+    df = df.copy()
+    for col in df.columns:
+        if df[col].dtype == "object" or pd.api.types.is_string_dtype(df[col].dtype):
+            if df[col].nunique(dropna=True) <= max_category_ratio * len(df):
+                df[col] = df[col].astype("category")
+    return df
+
+
+def write_partitioned_parquet(df, path, partition_col="quarter", part_name="part", append=False):
+    """
+    Write a dataframe as a Parquet dataset partitioned by snapshot quarter.
+    The dataset is replaced unless append is True (streaming chunks, incremental runs).
+    Files are named after their snapshot ("12-2023-part-0.parquet") so the rows of one
+    snapshot can be removed with remove_parquet_snapshots before it is written again.
+    """
+    if not append and os.path.exists(path):
+        shutil.rmtree(path)
+
+    df = to_columnar_types(df)
+    groups = df.groupby("snapshot", observed=True) if "snapshot" in df.columns else [("all", df)]
+    for snapshot, frame in groups:
+        frame.to_parquet(
+            path,
+            engine="pyarrow",
+            index=False,
+            partition_cols=[partition_col],
+            basename_template=f"{snapshot}-{part_name}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+
+
+def remove_parquet_snapshots(path, snapshots):
+    """
+    Delete the files of the given snapshots from a dataset written by write_partitioned_parquet.
+    """
+    for root, _, files in os.walk(path):
+        for file in files:
+            if any(file.startswith(f"{snapshot}-") for snapshot in snapshots):
+                os.remove(os.path.join(root, file))
+
+
+def read_partitioned_parquet(path, columns=None, quarters=None, partition_col="quarter"):
+    """
+    Read a Parquet dataset written by write_partitioned_parquet.
+    Only the requested columns and quarter partitions are loaded.
+    """
+    filters = [(partition_col, "in", list(quarters))] if quarters is not None else None
+    return pd.read_parquet(path, engine="pyarrow", columns=columns, filters=filters)
@@ -0,0 +1,118 @@
+import pandas as pd
+
+#Columns added by the snapshot loader, never part of the compared payload
+tag_columns = ["snapshot", "quarter"]
+
+
+def hash_rows(values):
+    """
+    64-bit hash of every row of a Series or DataFrame.
+    """
+    return pd.Series(pd.util.hash_pandas_object(values, index=False).to_numpy(), index=values.index)
+
+
+def deduplicate(df, key, keep="first", on_conflict="keep", key_values=None, payload=None):
+    """
+    Remove the rows whose natural key was already seen, hashing the key only once.
+
+    key: column or list of columns forming the natural key
+    keep: "first" or "last", the occurrence kept for a duplicated key
+    on_conflict: what to do when rows sharing a key have different payloads
+        "keep": keep one row as for any duplicate, "drop": drop every row of the key,
+        "raise": raise a ValueError listing the conflicting keys
+    key_values: precomputed key values used instead of df[key] (e.g. geometry WKB)
+    payload: columns compared to detect conflicts (default: every column but the key and the snapshot tags)
+
+    Returns (report, deduplicated frame). The report holds the counts and the removed duplicate rows.
+    """
+    key = [key] if isinstance(key, str) else list(key)
+    key_hash = hash_rows(df[key] if key_values is None else key_values)
+
+    duplicated = key_hash.duplicated(keep=keep)
+    repeated = key_hash.duplicated(keep=False)
+
+    # Payloads are only hashed for the rows whose key appears more than once
+    if payload is None:
+        payload = [col for col in df.columns if col not in key and col not in tag_columns]
+    if payload:
+        payload_hash = hash_rows(df.loc[repeated, payload])
+        payload_count = payload_hash.groupby(key_hash[repeated]).nunique()
+        conflicting_hashes = payload_count.index[payload_count > 1]
+    else:
+        conflicting_hashes = pd.Index([])
+    conflicting = key_hash.isin(conflicting_hashes)
+
+    if conflicting.any() and on_conflict == "raise":
+        raise ValueError(f"{conflicting_hashes.size} keys have conflicting rows:\n{df.loc[conflicting, key].drop_duplicates()}")
+    removed = duplicated | conflicting if on_conflict == "drop" else duplicated
+
+    report = {
+        "rows": len(df),
+        "duplicate_rows": int(duplicated.sum()),
+        "duplicate_keys": int(key_hash[repeated].nunique()),
+        "conflicting_keys": int(conflicting_hashes.size),
+        "removed_rows": int(removed.sum()),
+        "duplicates": df[removed],
+    }
+    return report, df[~removed]
+
+
+def print_report(report, name):
+    print(f"--- Duplicates in {name} ---")
+    print(f"Total duplicate rows: {report['duplicate_rows']} ({report['duplicate_keys']} keys)")
+    print(f"Keys with conflicting rows: {report['conflicting_keys']}")
+    print("Duplicate rows:")
+    print(report["duplicates"])
+    print(f"Rows after removing the duplicates: {report['rows'] - report['removed_rows']}")
+
+
+def validate_partition(population, parts, key):
+    """
+    Check that parts (e.g. {"active": ..., "inactive": ...}) split the population on the key:
+    every key of the population is in exactly one part, once, and no part has a key the population does not have.
+    The keys are hashed once per frame and compared with hash-based set operations (linear in the number of rows).
+    Returns a report with the counts and the offending keys.
+    """
+    key = [key] if isinstance(key, str) else list(key)
+    population_hash = hash_rows(population[key])
+    part_hashes = {name: hash_rows(part[key]) for name, part in parts.items()}
+
+    # Keys assigned more than once: found in several parts (overlap) or repeated inside a part
+    key_count = pd.concat(part_hashes.values()).value_counts()
+    assigned_twice = key_count.index[key_count > 1]
+    part_count = pd.concat([pd.Series(hashes[hashes.isin(assigned_twice)].unique()) for hashes in part_hashes.values()]).value_counts()
+    overlapping = part_count.index[part_count > 1]
+    repeated = assigned_twice.difference(overlapping, sort=False)
+
+    population_keys = pd.Index(population_hash.unique())
+    missing = population_keys.difference(key_count.index, sort=False)
+    unexpected = key_count.index.difference(population_keys, sort=False)
+
+    # Key values of the offending hashes (only those rows are gathered)
+    offending = overlapping.append([missing, unexpected, repeated]).unique()
+    frames = [(population, population_hash)] + [(parts[name], hashes) for name, hashes in part_hashes.items()]
+    keys = pd.concat([frame.loc[hashes.isin(offending).to_numpy(), key].set_axis(hashes[hashes.isin(offending)].to_numpy())
+                      for frame, hashes in frames])
+    keys = keys[~keys.index.duplicated()]
+
+    report = {
+        "rows": len(population),
+        "part_rows": {name: len(part) for name, part in parts.items()},
+        "overlapping_keys": keys.loc[overlapping].reset_index(drop=True),
+        "missing_keys": keys.loc[missing].reset_index(drop=True),
+        "unexpected_keys": keys.loc[unexpected].reset_index(drop=True),
+        "repeated_keys": keys.loc[repeated].reset_index(drop=True),
+    }
+    report["valid"] = not any(len(report[name]) for name in ["overlapping_keys", "missing_keys", "unexpected_keys", "repeated_keys"])
+    return report
+
+
+def print_partition_report(report, name):
+    print(f"--- Partition of {name} ---")
+    parts = " + ".join(f"{part} {rows}" for part, rows in report["part_rows"].items())
+    print(f"Rows: {report['rows']} = {parts}" if report["rows"] == sum(report["part_rows"].values()) else f"Rows: {report['rows']} != {parts}")
+    for check in ["overlapping_keys", "missing_keys", "unexpected_keys", "repeated_keys"]:
+        print(f"{check.replace('_', ' ').capitalize()}: {len(report[check])}")
+        if len(report[check]):
+            print(report[check].head(20))
+    print("Partition is valid" if report["valid"] else "Partition is NOT valid")
@@ -0,0 +1,89 @@
+import html
+import os
+from concurrent.futures import ProcessPoolExecutor
+from Parallel_Utils import worker_count
+
+#Maximum number of points drawn in a scatter plot
+scatter_sample_size = 20_000
+
+
+def add_figure(report, name, kind, data, **options):
+    """
+    Queue a diagnostic figure for the report stage instead of plotting it during the transformation.
+    kind: "boxplot", "histograms", "scatter", "heatmap"
+    data: dataframe (or {label: series} for "histograms"), copied so later steps can change the original
+    Scatter data is down-sampled here so the workers only receive the points they draw.
+    """
+    if kind == "scatter" and len(data) > scatter_sample_size:
+        data = data.sample(scatter_sample_size, random_state=0)
+    if isinstance(data, dict):
+        data = {label: values.copy() for label, values in data.items()}
+    else:
+        data = data.copy()
+    report.append({"name": name, "kind": kind, "data": data, "options": options})
+
+
+def render_figure(figure, directory):
+    """
+    Render one queued figure to a PNG file (runs in a worker process, without any display).
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    options = dict(figure["options"])
+    data = figure["data"]
+    fig = plt.figure(figsize=options.pop("figsize", (10, 6)))
+
+    if figure["kind"] == "boxplot":
+        sns.boxplot(x=options["x"], y=options["y"], data=data)
+    elif figure["kind"] == "histograms":
+        for label, values in data.items():
+            sns.histplot(values.dropna(), label=label, bins=options.get("bins", "auto"), kde=options.get("kde", False), alpha=0.5)
+        plt.legend()
+    elif figure["kind"] == "scatter":
+        sns.scatterplot(x=options["x"], y=options["y"], data=data)
+    elif figure["kind"] == "heatmap":
+        sns.heatmap(data, annot=True, cmap="coolwarm", fmt=".2f")
+    else:
+        raise ValueError(f"Unknown figure kind: {figure['kind']}")
+
+    plt.title(options.get("title", figure["name"]))
+    if "xlabel" in options:
+        plt.xlabel(options["xlabel"])
+    if "ylabel" in options:
+        plt.ylabel(options["ylabel"])
+    if options.get("rotate_xticks"):
+        plt.xticks(rotation=options["rotate_xticks"])
+
+    path = os.path.join(directory, f"{figure['name']}.png")
+    fig.savefig(path, bbox_inches="tight")
+    plt.close(fig)
+    return path
+
+
+def render_report(report, directory="eda_report", max_workers=None):
+    """
+    Render every queued figure to PNG in parallel worker processes and write an index.html page.
+    max_workers defaults to one process per core where the workers are forked, to this process elsewhere (see worker_count).
+    Returns the path of the index page.
+    """
+    os.makedirs(directory, exist_ok=True)
+    max_workers = worker_count(max_workers, len(report))
+    if max_workers <= 1:
+        paths = [render_figure(figure, directory) for figure in report]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            paths = list(pool.map(render_figure, report, [directory] * len(report)))
+
+    images = "\n".join(
+        f"<h2>{html.escape(figure['options'].get('title', figure['name']))}</h2>\n"
+        f"<img src=\"{html.escape(os.path.basename(path))}\">"
+        for figure, path in zip(report, paths)
+    )
+    index = os.path.join(directory, "index.html")
+    with open(index, "w", encoding="utf-8") as f:
+        f.write(f"<html><head><title>Listings EDA report</title></head><body>\n{images}\n</body></html>\n")
+    print(f"EDA report with {len(paths)} figures written to {index}")
+    return index
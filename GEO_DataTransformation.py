@@ -1,6 +1,11 @@
+import sys
 import geopandas as gpd
 import pandas as pd
 from shapely.geometry import shape
+from Columnar_Output import remove_parquet_snapshots, write_partitioned_parquet
+from Deduplication import deduplicate, print_report
+from Snapshot_Manifest import append_output, load_manifest, pending_files, record_files
+from Snapshot_Utils import load_snapshots
 
 GEO_Files = [
     "Raw_Data/neighbourhoods_GEO_12-2023.geojson",
@@ -9,9 +14,28 @@ GEO_Files = [
     "Raw_Data/neighbourhoods_GEO_09-2024.geojson"
 ]
 
-#Reading, importing and concatenating the csv files into a single dataframe
-dataframes_GEO = [gpd.read_file(file) for file in GEO_Files]
-GEO_data = gpd.GeoDataFrame(pd.concat(dataframes_GEO,  ignore_index=True))
+#COLUMNAR OUTPUT: also write a Parquet dataset partitioned by snapshot quarter
+columnar_output = False
+
+#Number of worker processes parsing the snapshot files (None = one per file on Linux, sequential on Windows/macOS
+#where the workers would re-import this script; 1 = sequential)
+load_workers = None
+
+#INCREMENTAL MODE: only parse the new or changed snapshots (tracked by content hash in
+#snapshot_manifest.json) and add their neighbourhoods to the existing outputs
+incremental_mode = False
+GEO_outputs = ["GEO_data.csv"] + (["GEO_data.parquet"] if columnar_output else [])
+
+if incremental_mode:
+    GEO_Files, changed_snapshots = pending_files(GEO_Files, load_manifest())
+    if not GEO_Files:
+        print("No new or changed GEO snapshot to process")
+        sys.exit()
+    if columnar_output:
+        remove_parquet_snapshots("GEO_data.parquet", changed_snapshots)
+
+#Reading, importing and concatenating the files in parallel (tagged with their snapshot and quarter)
+GEO_data = gpd.GeoDataFrame(load_snapshots(GEO_Files, reader=gpd.read_file, max_workers=load_workers))
 
 #DATA VALIDATION 
 print(GEO_data.info())
@@ -20,20 +44,11 @@ print(GEO_data["neighbourhood_group"])
 #DELETING neigh_group columns
 GEO_data = GEO_data.drop(columns="neighbourhood_group")
 
-# Check the total number of duplicates
-duplicate_count = GEO_data.duplicated().sum()
-print(f"Total duplicate rows: {duplicate_count}")
-
-# Display the duplicate rows
-duplicates = GEO_data[GEO_data.duplicated()]
-print("Duplicate rows:")
-print(duplicates)
-
-# Keep only the first occurrence
-GEO_data = GEO_data.drop_duplicates(keep="first")
-
-# Verify the result
-print(f"Rows after keeping the first occurrence of duplicates: {len(GEO_data)}")
+# CHECKING DUPLICATES on the geometry (WKB bytes hashed once, keeping the first occurrence)
+duplicate_report, GEO_data = deduplicate(
+    GEO_data, "geometry", key_values=GEO_data.geometry.to_wkb(), payload=["neighbourhood"]
+)
+print_report(duplicate_report, "GEO data")
 
 #LAST DATA VALIDATION 
 print(GEO_data.isna().sum())
@@ -57,8 +72,16 @@ gdf['centroid'] = gdf.geometry.centroid  # Recalculate centroids in EPSG:4326
 gdf['latitude'] = gdf['centroid'].apply(lambda point: point.y)  # Extract latitude
 gdf['longitude'] = gdf['centroid'].apply(lambda point: point.x)  # Extract longitude
 
-# Step 6: Save to CSV
-gdf[['neighbourhood', 'latitude', 'longitude']].to_csv("GEO_data.csv", index=False)
+# Step 6: Save to CSV (in incremental mode the new centroids replace the existing ones of the same neighbourhood)
+if incremental_mode:
+    append_output(gdf[['neighbourhood', 'latitude', 'longitude']], "GEO_data.csv", key="neighbourhood")
+else:
+    gdf[['neighbourhood', 'latitude', 'longitude']].to_csv("GEO_data.csv", index=False)
+if columnar_output:
+    write_partitioned_parquet(pd.DataFrame(gdf[['neighbourhood', 'latitude', 'longitude', 'snapshot', 'quarter']]), "GEO_data.parquet", append=incremental_mode)
+
+#Keeping track of the processed snapshots for the next incremental run
+record_files(GEO_Files, GEO_outputs)
 
 # Print Results to Verify
 print(gdf[['neighbourhood', 'latitude', 'longitude']].head())
@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+
+#Strategies of an imputation step:
+#  median / mean: statistic of the observed values of the column
+#  constant: fixed "value"
+#  ratio: "source" column x (mean of the column / mean of the source, on the rows where both are observed)
+imputation_strategies = ["median", "mean", "constant", "ratio"]
+
+
+def imputation_steps(spec):
+    """
+    Normalize a spec {column: step or [steps]} to {column: [steps]}.
+    A step is a dict with a "strategy", optional group keys "by" and the options of its strategy.
+    """
+    steps = {}
+    for column, column_steps in spec.items():
+        column_steps = [column_steps] if isinstance(column_steps, dict) else list(column_steps)
+        for step in column_steps:
+            if step.get("strategy") not in imputation_strategies:
+                raise ValueError(f"Unknown imputation strategy for {column}: {step.get('strategy')}")
+        steps[column] = column_steps
+    return steps
+
+
+def group_statistics(df, steps, keys):
+    """
+    Statistics of every step grouped by the same keys, computed in one groupby.
+    Returns the statistics aligned to the rows of df (one column per step) and their global value,
+    used for the groups where a statistic is missing.
+    """
+    inputs, functions = {}, {}
+    for column, step_number, step in steps:
+        name = f"{column}__{step_number}"
+        if step["strategy"] == "ratio":
+            observed = df[column].notna() & df[step["source"]].notna()
+            inputs[f"{name}__num"] = df[column].where(observed).astype("float64")
+            inputs[f"{name}__den"] = df[step["source"]].where(observed).astype("float64")
+            functions[f"{name}__num"] = functions[f"{name}__den"] = "mean"
+        else:
+            inputs[name] = df[column].astype("float64")
+            functions[name] = step["strategy"]
+    inputs = pd.DataFrame(inputs, index=df.index)
+
+    if keys:
+        codes = df.groupby(keys, observed=True, sort=False, dropna=False).ngroup().to_numpy()
+    else:
+        codes = np.zeros(len(df), dtype=np.intp)
+    grouped = inputs.groupby(codes).agg(functions)
+    overall = inputs.agg(functions)
+
+    def finish(values):
+        # Ratio steps: ratio of the two means
+        result = {}
+        for column, step_number, step in steps:
+            name = f"{column}__{step_number}"
+            if step["strategy"] == "ratio":
+                result[name] = values[f"{name}__num"] / values[f"{name}__den"]
+            else:
+                result[name] = values[name]
+        return result
+
+    aligned = pd.DataFrame(finish(grouped), index=grouped.index).reindex(codes)
+    aligned.index = df.index
+    return aligned, finish(overall)
+
+
+def impute(df, spec):
+    """
+    Impute missing values from a declarative spec, e.g.
+        {"host_response_rate": {"strategy": "median", "by": ["neighbourhood_cleansed"]},
+         "host_response_time": {"strategy": "constant", "value": "within an hour"},
+         "beds": [{"strategy": "ratio", "source": "bedrooms"}, {"strategy": "median"}]}
+    Every statistic is computed from the observed values, in one groupby per set of group keys,
+    and all the columns are filled in one pass. When a column has several steps, a value missing after
+    a step is filled by the next one. Groups without statistic take the statistic of the whole frame.
+    Returns a report of the imputed values per column, step and group, and the imputed frame.
+    """
+    steps = imputation_steps(spec)
+
+    # Steps grouped by their group keys: one groupby for each set of keys
+    by_keys = {}
+    for column, column_steps in steps.items():
+        for step_number, step in enumerate(column_steps):
+            if step["strategy"] != "constant":
+                by_keys.setdefault(tuple(step.get("by", [])), []).append((column, step_number, step))
+    statistics, fallbacks = {}, {}
+    for keys, key_steps in by_keys.items():
+        aligned, overall = group_statistics(df, key_steps, list(keys))
+        statistics.update({name: aligned[name] for name in aligned.columns})
+        fallbacks.update(overall)
+
+    observed, df = df, df.copy()
+    report = []
+    for column, column_steps in steps.items():
+        filled = df[column]
+        for step_number, step in enumerate(column_steps):
+            name = f"{column}__{step_number}"
+            if step["strategy"] == "constant":
+                values = pd.Series(step["value"], index=df.index)
+            else:
+                values = statistics[name].fillna(fallbacks[name])
+                if step["strategy"] == "ratio":
+                    values = observed[step["source"]] * values
+            if pd.api.types.is_float_dtype(df[column].dtype):
+                values = values.astype(df[column].dtype)
+            imputed = filled.isna() & values.notna()
+            filled = filled.where(~imputed, values)
+            report.append(imputation_counts(df, column, step, imputed))
+        df[column] = filled
+
+    return pd.concat(report, ignore_index=True), df
+
+
+def imputation_counts(df, column, step, imputed):
+    """
+    Number of values imputed by one step, per group of its keys ("all" without keys).
+    """
+    keys = step.get("by", [])
+    if keys:
+        counts = imputed.groupby([df[key] for key in keys], observed=True, dropna=False).sum()
+        counts = counts[counts > 0]
+        groups = [" / ".join(map(str, group if isinstance(group, tuple) else (group,))) for group in counts.index]
+    else:
+        counts = pd.Series([imputed.sum()])
+        groups = ["all"]
+    return pd.DataFrame({
+        "column": column,
+        "strategy": step["strategy"],
+        "by": ", ".join(keys) if keys else "",
+        "group": groups,
+        "imputed": counts.to_numpy(dtype="int64"),
+    })
+
+
+def print_imputation_report(report, name):
+    """
+    Imputed values per column (and per group when the spec has group keys).
+    """
+    print(f"--- Imputation of {name}: {int(report['imputed'].sum())} values ---")
+    print(report.groupby(["column", "strategy"], sort=False)["imputed"].sum().to_string())
+    if (report["by"] != "").any():
+        print(report[report["by"] != ""].sort_values("imputed", ascending=False).head(20).to_string(index=False))
@@ -0,0 +1,160 @@
+from collections import Counter
+import numpy as np
+import pandas as pd
+from Review_Text import clean_comment
+
+#Seed texts of the languages seen in the Montreal reviews (cleaned like the comments before training)
+language_seed_texts = {
+    "en": "the place was great and the host was very nice, we had a wonderful stay. the apartment is clean, "
+          "comfortable and close to everything. would definitely recommend this place to anyone, thank you! "
+          "location was perfect, easy check in, the bed was comfortable and the room was quiet. "
+          "we would stay here again. it was a good experience, everything was as described. "
+          "nice neighborhood with restaurants and shops nearby, walking distance to the metro.",
+    "fr": "très bel appartement, propre et bien situé. l'hôte est très sympathique et disponible, je recommande "
+          "vivement ce logement. séjour agréable, nous avons passé un excellent séjour. "
+          "le quartier est calme et proche du métro, tout était parfait. merci pour votre accueil chaleureux! "
+          "l'appartement correspond à la description, le lit était confortable et la cuisine bien équipée. "
+          "nous reviendrons avec plaisir, c'était une très bonne expérience.",
+    "es": "el apartamento es muy bonito y limpio, la ubicación es excelente. el anfitrión fue muy amable y "
+          "nos ayudó con todo. recomiendo este lugar, nos sentimos como en casa. muy buena experiencia, "
+          "todo estaba perfecto y cerca del metro. gracias por todo, volveremos pronto. "
+          "la habitación era cómoda y tranquila, la cocina tiene todo lo necesario.",
+    "de": "die wohnung war sehr schön und sauber, die lage ist perfekt. der gastgeber war sehr freundlich und "
+          "hilfsbereit. wir haben uns sehr wohl gefühlt und können die unterkunft nur empfehlen. "
+          "alles war wie beschrieben, das bett war bequem und die küche gut ausgestattet. "
+          "vielen dank für alles, wir kommen gerne wieder. ruhige gegend mit restaurants in der nähe.",
+    "it": "l'appartamento è molto bello e pulito, la posizione è ottima. l'host è stato molto gentile e "
+          "disponibile. consiglio vivamente questo alloggio, ci siamo trovati benissimo. "
+          "tutto era come descritto, il letto era comodo e la cucina ben attrezzata. "
+          "grazie di tutto, torneremo sicuramente. quartiere tranquillo vicino alla metropolitana.",
+    "pt": "o apartamento é muito bonito e limpo, a localização é excelente. o anfitrião foi muito simpático e "
+          "prestativo. recomendo este lugar, nos sentimos em casa. tudo estava perfeito e perto do metrô. "
+          "a cama era confortável e a cozinha bem equipada. obrigado por tudo, voltaremos com certeza. "
+          "bairro tranquilo com restaurantes por perto.",
+}
+#Character n-gram orders and characters of a comment used for the detection
+ngram_orders = (1, 2, 3)
+max_detected_chars = 300
+#Posterior probability under which a comment is labelled "unknown"
+min_language_probability = 0.95
+#Translator calls per comment of every route (the baseline round trip is 2 calls)
+route_calls = {"skip": 0, "from_intermediate": 1, "round_trip": 2}
+
+
+def char_ngrams(text, orders=ngram_orders):
+    """
+    Character n-grams of the text padded with spaces (word starts and ends become n-grams).
+    """
+    text = f" {text[:max_detected_chars]} "
+    return [text[start:start + n] for n in orders for start in range(len(text) - n + 1)]
+
+
+def train_language_model(texts_by_language, alpha=0.5, max_features=3000):
+    """
+    Multinomial naive Bayes over character n-grams: {language: [texts]} -> model with the n-gram vocabulary
+    (most frequent n-grams of every language) and a (vocabulary + 1) x languages matrix of log probabilities
+    (last row: unseen n-gram).
+    """
+    languages = list(texts_by_language)
+    counts = {language: Counter(gram for text in texts for gram in char_ngrams(text)) for language, texts in texts_by_language.items()}
+    vocabulary = {}
+    for language in languages:
+        for gram, _ in counts[language].most_common(max_features):
+            vocabulary.setdefault(gram, len(vocabulary))
+
+    matrix = np.zeros((len(vocabulary) + 1, len(languages)))
+    for column, language in enumerate(languages):
+        for gram, row in vocabulary.items():
+            matrix[row, column] = counts[language][gram]
+    totals = matrix.sum(axis=0)
+    log_probs = np.log(matrix + alpha) - np.log(totals + alpha * (len(vocabulary) + 1))
+    return {"languages": languages, "vocabulary": vocabulary, "log_probs": log_probs}
+
+
+def seed_language_model():
+    """
+    Model trained on the seed texts only (each sentence is a training text).
+    """
+    return train_language_model({
+        language: [clean_comment(sentence) for sentence in text.split(". ")]
+        for language, text in language_seed_texts.items()
+    })
+
+
+def detect_languages(texts, model, min_probability=min_language_probability):
+    """
+    Language of every text and its posterior probability, scored in one vectorized pass
+    (n-gram ids gathered from the log probability matrix, summed per text with reduceat).
+    Texts without n-grams or under min_probability are labelled "unknown".
+    """
+    vocabulary, unseen = model["vocabulary"], len(model["vocabulary"])
+    ids, lengths = [], []
+    for text in texts:
+        grams = char_ngrams(text) if text and text.strip() else []
+        ids.extend(vocabulary.get(gram, unseen) for gram in grams)
+        lengths.append(len(grams))
+    lengths = np.array(lengths, dtype=np.int64)
+    if not lengths.any():
+        return pd.DataFrame({"language": ["unknown"] * len(lengths), "probability": np.zeros(len(lengths))})
+
+    # Sum of the rows of every text (texts without n-grams are filtered out after)
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    scores = np.add.reduceat(model["log_probs"][np.array(ids, dtype=np.int64)], np.minimum(starts, len(ids) - 1), axis=0)
+    scores -= scores.max(axis=1, keepdims=True)
+    probabilities = np.exp(scores) / np.exp(scores).sum(axis=1, keepdims=True)
+
+    best = probabilities.argmax(axis=1)
+    probability = probabilities[np.arange(len(best)), best]
+    language = np.array(model["languages"], dtype=object)[best]
+    unknown = (lengths == 0) | (probability < min_probability)
+    language[unknown] = "unknown"
+    return pd.DataFrame({"language": language, "probability": np.where(lengths == 0, 0.0, probability)})
+
+
+def bootstrap_language_model(texts, model=None, min_probability=0.99, max_texts=20_000, rounds=1):
+    """
+    Adapt the model to the comments themselves: the comments labelled with a high probability
+    (distinct texts, up to max_texts per language) are added to the seed texts and the model is trained again.
+    """
+    model = model or seed_language_model()
+    texts = pd.Series(texts).drop_duplicates().reset_index(drop=True)
+    for _ in range(rounds):
+        labels = detect_languages(texts, model, min_probability)
+        training = {
+            language: [clean_comment(sentence) for sentence in text.split(". ")]
+                      + texts[labels["language"] == language].head(max_texts).tolist()
+            for language, text in language_seed_texts.items()
+        }
+        model = train_language_model(training)
+    return model
+
+
+def translation_route(language, intermediate_lang="fr", target_lang="en"):
+    """
+    Translator work of a comment: none when it is already in the target language, only the way back when it
+    is already in the intermediate language, the full round trip otherwise (other or unknown language).
+    """
+    if language == target_lang:
+        return "skip"
+    if language == intermediate_lang:
+        return "from_intermediate"
+    return "round_trip"
+
+
+def routing_report(languages, intermediate_lang="fr", target_lang="en"):
+    """
+    Comments and translator calls per language, with the calls saved against a round trip for every comment.
+    """
+    report = pd.Series(languages).value_counts().rename_axis("language").reset_index(name="comments")
+    report["route"] = report["language"].map(lambda language: translation_route(language, intermediate_lang, target_lang))
+    report["calls"] = report["comments"] * report["route"].map(route_calls)
+    report["calls_saved"] = report["comments"] * route_calls["round_trip"] - report["calls"]
+    return report
+
+
+def print_routing_report(report):
+    total = int(report["comments"].sum()) * route_calls["round_trip"]
+    saved = int(report["calls_saved"].sum())
+    print("--- Language prefilter ---")
+    print(report.to_string(index=False))
+    print(f"Translator calls: {total - saved} instead of {total} ({saved} saved, {saved / max(total, 1):.0%})")
@@ -0,0 +1,83 @@
+import pandas as pd
+
+#Mapping to transform the remaining data label
+bathroom_type_mapping = {
+    "bath": "bath",
+    "baths": "bath",
+    "half-bath": "bath",  # Include half-bath in the "bath" category
+    "shared bath": "shared bath",
+    "shared baths": "shared bath",
+    "private bath": "private bath"
+}
+
+
+# Function to Extract the number of bathrooms (row-wise reference implementation)
+def extract_bathrooms_number(text):
+    if pd.isna(text):  # Handle NaN values
+        return None
+    if "Half" in text or "half" in text:
+        # Check if there's a number before "Half" and add 0.5
+        parts = text.split()
+        try:
+            number = float(parts[0]) if parts[0].replace('.', '', 1).isdigit() else 0
+            return number + 0.5
+        except ValueError:
+            return 0.5
+    else:
+        # Extract numeric part from the string
+        try:
+            return float(text.split()[0])
+        except ValueError:
+            return None
+
+
+# Function to Extract the type of bathroom (row-wise reference implementation)
+def extract_bathroom_type(text):
+    if pd.isna(text):  # Handle NaN values
+        return None
+    parts = text.split()
+    return " ".join(parts[1:]) if len(parts) > 1 else None
+
+
+def parse_bathrooms_values(bathrooms_text):
+    """
+    Vectorized parsing of bathrooms_text values with pandas string extraction.
+    Same results as extract_bathrooms_number / extract_bathroom_type followed by the mapping and the imputation.
+    """
+    text = pd.Series(bathrooms_text, dtype="object")
+
+    # First word (the number, when there is one) and the rest of the text
+    parts = text.str.extract(r"^\s*(?P<first>\S+)(?:\s+(?P<rest>.*?))?\s*$")
+    first = parts["first"]
+    rest = parts["rest"].str.replace(r"\s+", " ", regex=True)
+
+    # "Half" baths: number before it (0 if none) + 0.5, otherwise the first word as a number
+    has_half = text.str.contains("Half|half", regex=True, na=False)
+    first_is_number = first.str.fullmatch(r"\d*\.?\d*", na=False) & first.str.contains(r"\d", regex=True, na=False)
+    half_number = pd.to_numeric(first.where(first_is_number), errors="coerce").fillna(0) + 0.5
+    number = half_number.where(has_half, pd.to_numeric(first, errors="coerce"))
+
+    bathroom_type = rest.where(rest.str.len() > 0).replace(bathroom_type_mapping)
+
+    return pd.DataFrame({
+        "bathroom_number": number.fillna(1).astype("float64"),
+        "bathroom_type": bathroom_type.fillna("bath").astype("object"),
+        "bathroom_is_shared": text.str.contains("shared", case=False, na=False).astype(bool),
+    })
+
+
+def parse_bathrooms_text(bathrooms_text):
+    """
+    Parse the bathrooms_text column into bathroom_number, bathroom_type and bathroom_is_shared.
+    The column only holds a few dozen distinct values, so each distinct value is parsed once
+    and the results are spread back to the rows by their factorized code.
+    """
+    codes, uniques = pd.factorize(bathrooms_text, use_na_sentinel=True)
+    parsed = parse_bathrooms_values(list(uniques) + [None])
+
+    # Missing values (code -1) take the last row, parsed from None
+    codes = codes.copy()
+    codes[codes < 0] = len(uniques)
+    result = parsed.take(codes)
+    result.index = bathrooms_text.index
+    return result
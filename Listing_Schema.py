@@ -0,0 +1,118 @@
+import pandas as pd
+
+#COLUMNS NEVER LOADED: the decisions of the listings script, pushed down into the csv reader
+#Deleted as not needed for the analysis
+listing_deleted_columns = [   #10 columns deleted
+    "description", "neighborhood_overview",
+    "host_url", "picture_url", "host_picture_url",
+    "neighbourhood", "neighbourhood_group_cleansed",
+    "bathrooms", "price", "calendar_updated"]
+
+#Deleted after exploration: host_location is not insightful, host_neighbourhood has too many missing values
+listing_deleted_host_columns = ["host_location", "host_neighbourhood"]
+
+#Columns only read to derive a flag: about half of host_about is missing, only its presence is kept
+listing_flag_columns = {"host_about": "has_host_description"}
+
+#Text read as missing by pd.read_csv (default na_values)
+missing_markers = {
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+}
+
+
+def has_value(text):
+    """
+    Converter reducing a free-text cell to "is filled" while parsing (the text itself is not kept).
+    """
+    return text not in missing_markers
+
+
+def read_listings(file, **read_kwargs):
+    """
+    Read a listings csv without the declared dropped columns, the flag columns being reduced to booleans.
+    """
+    skipped = set(listing_deleted_columns) | set(listing_deleted_host_columns)
+    listing_data = pd.read_csv(
+        file,
+        usecols=lambda col: col not in skipped,
+        converters={col: has_value for col in listing_flag_columns},
+        **read_kwargs,
+    )
+    return listing_data.rename(columns=listing_flag_columns)
+
+
+#MEMORY SCHEMA: applied right after load, so the later steps run on the smaller frame
+#'t'/'f' flags, read as nullable booleans (missing values are kept until their imputation)
+listing_boolean_columns = [
+    "host_is_superhost", "host_has_profile_pic", "host_identity_verified",
+    "has_availability", "instant_bookable"]
+
+#Low-cardinality text, stored as categoricals (ordered when the categories are declared)
+listing_category_columns = {
+    "room_type": None,
+    "property_type": None,
+    "neighbourhood_cleansed": None,
+    "host_response_time": ["within an hour", "within a few hours", "within a day", "a few days or more"],
+    "bathroom_type": None,  #created by the bathrooms_text parsing
+}
+
+#Counts, downcast to the smallest integer type (smallest float type when values are missing)
+listing_count_columns = [
+    "host_listings_count", "host_total_listings_count", "accommodates",
+    "minimum_nights", "maximum_nights", "minimum_minimum_nights", "maximum_minimum_nights",
+    "minimum_maximum_nights", "maximum_maximum_nights",
+    "availability_30", "availability_60", "availability_90", "availability_365",
+    "number_of_reviews", "number_of_reviews_ltm", "number_of_reviews_l30d",
+    "calculated_host_listings_count", "calculated_host_listings_count_entire_homes",
+    "calculated_host_listings_count_private_rooms", "calculated_host_listings_count_shared_rooms"]
+
+#Scores, stored as float32 (beds and bedrooms stay float64: their imputation writes ratios into them)
+listing_score_columns = [
+    "review_scores_rating", "review_scores_accuracy", "review_scores_cleanliness",
+    "review_scores_checkin", "review_scores_communication", "review_scores_location",
+    "review_scores_value", "reviews_per_month"]
+
+
+def to_category(values, categories=None):
+    """
+    Categorical version of a text column. Declared categories are ordered, values outside them are added at the end.
+    """
+    if categories is None:
+        return values.astype("category")
+    extra = sorted(set(values.dropna().unique()) - set(categories))
+    return values.astype(pd.CategoricalDtype(list(categories) + extra, ordered=True))
+
+
+def optimize_listing_dtypes(listing_data):
+    """
+    Apply the memory schema to the listings frame (columns absent from the frame are skipped).
+    Returns a report of the memory used by each column (before / after) and the converted frame.
+    """
+    before = listing_data.memory_usage(deep=True)
+    listing_data = listing_data.copy()
+
+    for col in listing_data.columns.intersection(listing_boolean_columns):
+        listing_data[col] = listing_data[col].map({"t": True, "f": False}).astype("boolean")
+    for col in listing_data.columns.intersection(list(listing_category_columns)):
+        listing_data[col] = to_category(listing_data[col], listing_category_columns[col])
+    for col in listing_data.columns.intersection(listing_count_columns):
+        values = pd.to_numeric(listing_data[col], downcast="integer")
+        listing_data[col] = values if values.dtype.kind in "iu" else pd.to_numeric(values, downcast="float")
+    for col in listing_data.columns.intersection(listing_score_columns):
+        listing_data[col] = pd.to_numeric(listing_data[col], downcast="float")
+
+    after = listing_data.memory_usage(deep=True)
+    report = pd.DataFrame({"dtype": listing_data.dtypes.astype(str), "before_mb": before / 1e6, "after_mb": after / 1e6})
+    report = report.drop(index="Index", errors="ignore")
+    return report, listing_data
+
+
+def print_memory_report(report, name):
+    """
+    Print the memory used by the frame before / after the schema, with the columns that shrank the most.
+    """
+    total_before, total_after = report["before_mb"].sum(), report["after_mb"].sum()
+    print(f"--- Memory of {name}: {total_before:.1f} MB -> {total_after:.1f} MB ---")
+    saved = (report["before_mb"] - report["after_mb"]).sort_values(ascending=False)
+    print(report.loc[saved[saved > 0].index[:15]].round(2))
@@ -0,0 +1,89 @@
+import pandas as pd
+
+#Per-snapshot metrics, kept in the quarterly fact table (exact names and name prefixes)
+fact_columns = [
+    "scrape_id", "calendar_last_scraped", "host_tenure", "host_is_superhost",
+    "host_response_time", "host_response_rate", "host_acceptance_rate",
+    "host_listings_count", "host_total_listings_count",
+    "has_availability", "instant_bookable", "inactive_listing",
+    "first_review", "last_review", "reviews_per_month"]
+fact_column_prefixes = [
+    "availability_", "number_of_reviews", "review_scores_", "calculated_host_listings_count",
+    "minimum_", "maximum_"]
+
+#Snapshot tags of every row
+snapshot_columns = ["snapshot", "quarter"]
+
+
+def split_star_columns(listings):
+    """
+    Split the cleaned listings columns into fact metrics, host attributes and listing attributes.
+    """
+    keys = ["id", "host_id"] + snapshot_columns
+    facts = [col for col in listings.columns if col not in keys and (
+        col in fact_columns or any(col.startswith(prefix) for prefix in fact_column_prefixes))]
+    hosts = [col for col in listings.columns if col not in keys + facts and (
+        col.startswith("host_") or col == "has_host_description")]
+    attributes = [col for col in listings.columns if col not in keys + facts + hosts]
+    return facts, hosts, attributes
+
+
+def latest_dimension(rows, key, attributes):
+    """
+    One row per key with its attributes from the latest snapshot.
+    """
+    latest = rows.drop_duplicates(subset=key, keep="last")
+    return latest[[key] + attributes + ["snapshot"]].rename(columns={"snapshot": "last_snapshot"}).reset_index(drop=True)
+
+
+def scd2_dimension(rows, key, attributes, key_name):
+    """
+    Slowly changing dimension (type 2): a new version of a key starts at every snapshot where its
+    attributes change. Each version gets a surrogate key, the snapshot it is valid from, the snapshot
+    the next version starts (valid_to, empty for the current one) and an is_current flag.
+    Returns the dimension and the surrogate key of every input row.
+    """
+    attribute_hash = pd.util.hash_pandas_object(rows[attributes], index=False)
+    new_version = (rows[key] != rows[key].shift()) | (attribute_hash != attribute_hash.shift())
+    surrogate = new_version.cumsum() - 1
+
+    versions = rows[new_version]
+    dimension = versions[[key] + attributes].reset_index(drop=True)
+    dimension.insert(0, key_name, surrogate[new_version].to_numpy())
+    dimension["valid_from"] = versions["snapshot"].to_numpy()
+    dimension["valid_to"] = dimension.groupby(key)["valid_from"].shift(-1)
+    dimension["is_current"] = dimension["valid_to"].isna()
+    return dimension, surrogate.rename(key_name)
+
+
+def build_star_schema(listings, history="latest"):
+    """
+    Split the cleaned listings (one row per listing and snapshot) into a star schema:
+    dim_listing (one row per listing), dim_host (one row per host) and fact_listing_quarter
+    (the per-snapshot metrics). history: "latest" keeps the latest attributes of every listing / host,
+    "scd2" keeps a versioned row per change and the fact table points to the version of its snapshot.
+    Returns a dictionary {table name: dataframe}.
+    """
+    if history not in ("latest", "scd2"):
+        raise ValueError(f"Unknown history mode: {history}")
+    facts, hosts, attributes = split_star_columns(listings)
+
+    # Chronological order of the snapshots inside every listing / host
+    listing_rows = listings.sort_values(["id", "quarter"], kind="stable").reset_index(drop=True)
+    host_rows = listings.sort_values(["host_id", "quarter"], kind="stable").drop_duplicates(subset=["host_id", "quarter"])
+    host_rows = host_rows.reset_index(drop=True)
+    fact = listing_rows[["id", "host_id"] + snapshot_columns + facts]
+
+    if history == "latest":
+        return {
+            "dim_listing": latest_dimension(listing_rows, "id", ["host_id"] + attributes),
+            "dim_host": latest_dimension(host_rows, "host_id", hosts),
+            "fact_listing_quarter": fact,
+        }
+
+    dim_listing, listing_key = scd2_dimension(listing_rows, "id", ["host_id"] + attributes, "listing_key")
+    dim_host, host_key = scd2_dimension(host_rows, "host_id", hosts, "host_key")
+    host_versions = pd.concat([host_rows[["host_id"] + snapshot_columns], host_key], axis=1)
+    fact = pd.concat([listing_key, fact], axis=1).merge(host_versions, on=["host_id"] + snapshot_columns, how="left")
+    fact.insert(1, "host_key", fact.pop("host_key"))
+    return {"dim_listing": dim_listing, "dim_host": dim_host, "fact_listing_quarter": fact}
@@ -1,8 +1,17 @@
 # %%
+import sys
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-from datetime import datetime
+from Columnar_Output import remove_parquet_snapshots, write_partitioned_parquet
+from Deduplication import deduplicate, print_partition_report, print_report, validate_partition
+from EDA_Report import add_figure, render_report
+from Imputation import impute, print_imputation_report
+from Listing_Parsers import parse_bathrooms_text
+from Listing_Schema import optimize_listing_dtypes, print_memory_report, read_listings, to_category
+from Listing_Star_Schema import build_star_schema
+from Pipeline_Profiler import run_stage, save_profile, start_profile
+from Snapshot_Manifest import append_output, load_manifest, pending_files, record_files, remove_snapshots
+from Snapshot_Utils import load_snapshot_registry, load_snapshots, quarter_categories, quarters_from_dates, snapshot_dates
+from Stage_Cache import cached
 
 #Listing the file directory
 listing_Files = [
@@ -11,125 +20,132 @@ listing_Files = [
     "Raw_Data/listings_03-2024.csv",
     "Raw_Data/listings_09-2024.csv"
 ]
-#Reading, important and concatenating the csv files into a single dataframe
-dataframes_listing = [pd.read_csv(file, low_memory=False) for file in listing_Files]
-listing_data = pd.concat(dataframes_listing, ignore_index=True)
+#COLUMNAR OUTPUT: also write Parquet datasets partitioned by quarter
+columnar_output = False
+#Number of worker processes parsing the snapshot files (None = one per file on Linux, sequential on Windows/macOS
+#where the workers would re-import this script; 1 = sequential)
+load_workers = None
+
+#HEADLESS MODE: the transformation runs without any plotting. With eda_report = True the diagnostic
+#figures are queued and rendered to PNG files (eda_report/index.html) at the end of the run, by worker processes
+#on Linux and in this process on Windows/macOS (where the workers would re-import this script)
+eda_report = False
+eda_figures = []
+
+#STAGE PROFILE: each transformation stage is timed (wall / CPU) with its memory and rows / columns in and out.
+#The profile of the run is written to pipeline_profiles/ (trace_memory adds the peak allocated memory but slows the run)
+trace_memory = False
+pipeline_profile = start_profile(trace_memory)
+
+#STAGE CACHE: the output of each transformation stage is kept in stage_cache/, keyed by a hash of its input data,
+#its settings and its code (Stage_Cache.py). A rerun after changing one late step reuses the unchanged stages
+use_stage_cache = False
+
+
+def stage(func):
+    #The snapshot registry is part of the key: quarters and reference dates are read from it
+    return cached(func, registry=load_snapshot_registry()) if use_stage_cache else func
+
+#STAR SCHEMA EXPORT: also split the active listings into dim_listing.csv, dim_host.csv (one row per listing / host)
+#and a narrow fact_listing_quarter.csv with the per-snapshot metrics. star_schema_history = "latest" keeps the latest
+#attributes, "scd2" keeps one versioned row per change (valid_from / valid_to snapshots)
+star_schema_output = False
+star_schema_history = "latest"
+
+#IMPUTATION (Imputation.py): group keys of the median and ratio imputations, e.g. ["neighbourhood_cleansed", "room_type"]
+#(empty = statistics of the whole frame). All the statistics of a step are computed in one groupby
+imputation_by = []
+
+#INCREMENTAL MODE: only parse the new or changed snapshots (tracked by content hash in
+#snapshot_manifest.json) and add them to the existing outputs.
+#The imputation medians are then computed on the new snapshots only.
+incremental_mode = False
+listing_outputs = ["listing_data_actice.csv", "all_inactive_listings.csv"]
+if columnar_output:
+    listing_outputs += ["listing_data_active.parquet", "all_inactive_listings.parquet"]
+if star_schema_output:
+    listing_outputs += ["dim_listing.csv", "dim_host.csv", "fact_listing_quarter.csv"]
+
+if incremental_mode:
+    listing_Files, changed_snapshots = pending_files(listing_Files, load_manifest())
+    if not listing_Files:
+        print("No new or changed listing snapshot to process")
+        sys.exit()
+    print(f"Processing {len(listing_Files)} new or changed listing snapshot(s): {listing_Files}")
+
+#Reading, important and concatenating the csv files in parallel (tagged with their snapshot)
+#The dropped columns (Listing_Schema.py) are never parsed: they are skipped by the csv reader
+listing_data = run_stage(
+    pipeline_profile, "load", load_snapshots, listing_Files, reader=read_listings, max_workers=load_workers, low_memory=False
+)
+
+# %% #MEMORY SCHEMA (Listing_Schema.py): t/f flags as booleans, low-cardinality text as categoricals,
+#counts and scores downcast. Every later filter, groupby and median runs on the smaller frame
+def apply_memory_schema(listing_data):
+    memory_report, listing_data = optimize_listing_dtypes(listing_data)
+    print_memory_report(memory_report, "listings")
+    return listing_data
+
+listing_data = run_stage(pipeline_profile, "memory_schema", stage(apply_memory_schema), listing_data)
 
 # %% #DATA VALIDATION - Exploring the DataFrame
 print(listing_data.info())
 
-# %% #DUPLICATE ANALYSES + transforming date into quarter
-# Check for duplicate rows
-duplicates = listing_data[listing_data.duplicated()]
-print("Number of duplicate rows:", duplicates.shape[0])
-
-# %% Separating the data in quarters
+# %% Separating the data in quarters + #DUPLICATE ANALYSES on (id, quarter)
 # Data exploration
 print(listing_data["last_scraped"].value_counts())
 print(listing_data["last_scraped"].isna().sum())
 print(listing_data["last_scraped"].dtype)
 
-# Transform last_scraped into datetime
-listing_data["last_scraped"] = pd.to_datetime(listing_data["last_scraped"], errors="coerce")
-print(listing_data["last_scraped"].dtype)
+def assign_quarters(listing_data):
+    # Transform last_scraped into datetime
+    listing_data["last_scraped"] = pd.to_datetime(listing_data["last_scraped"], errors="coerce")
 
-# Function to assign quarter based on timestamp
-def assign_quarter(date):
-    if date == pd.Timestamp("2023-12-13"):
-        return "Q1"
-    elif date == pd.Timestamp("2024-03-23"):
-        return "Q2"
-    elif date in [pd.Timestamp("2024-06-18"), pd.Timestamp("2024-06-19")]:
-        return "Q3"
-    elif date == pd.Timestamp("2024-09-13"):
-        return "Q4"
-    else:
-        return "Unknown"  # For unexpected dates
-
-# Apply the function to the last_scraped column
-listing_data["quarter"] = listing_data["last_scraped"].apply(assign_quarter)
-print(listing_data["quarter"].value_counts())
+    # Quarter looked up in the snapshot registry (snapshot_registry.csv) from the scrape date,
+    # rows scraped outside the registered dates keep the quarter of their source file
+    scraped_quarter = quarters_from_dates(listing_data["last_scraped"])
+    listing_data["quarter"] = scraped_quarter.where(scraped_quarter != "Unknown", listing_data["quarter"])
 
-#DELETING THE LAST SCRAPED COLUMN
-listing_data = listing_data.drop(columns="last_scraped")
+    # Check for duplicate listings in a quarter (key hashed once, keeping the first occurrence)
+    duplicate_report, listing_data = deduplicate(listing_data, ["id", "quarter"])
+    print_report(duplicate_report, "listings")
 
+    #DELETING THE LAST SCRAPED COLUMN
+    return listing_data.drop(columns="last_scraped")
 
-# %% #LISTING COLUMNS DELETION
-listing_deleted_columns = [   #10 columns deleted
-    "description", "neighborhood_overview", 
-    "host_url", "picture_url", "host_picture_url", 
-    "neighbourhood", "neighbourhood_group_cleansed", 
-    "bathrooms", "price", "calendar_updated"]
+listing_data = run_stage(pipeline_profile, "quarter_assignment", stage(assign_quarters), listing_data)
+#Keys of the deduplicated listings: active + inactive listings must cover them exactly once
+listing_population = listing_data[["id", "quarter"]]
+print(listing_data["quarter"].value_counts())
 
-listing_data = listing_data.drop(columns=listing_deleted_columns)
+
+# %% #LISTING COLUMNS DELETION
+#The 10 deleted columns (listing_deleted_columns in Listing_Schema.py) are pruned at read time (load stage)
 
 # %% #Handeling the bathrooms_text columns missing values 
-# Function to Extract the number of bathrooms
-def extract_bathrooms_number(text):
-    if pd.isna(text):  # Handle NaN values
-        return None
-    if "Half" in text or "half" in text:
-        # Check if there's a number before "Half" and add 0.5
-        parts = text.split()
-        try:
-            number = float(parts[0]) if parts[0].replace('.', '', 1).isdigit() else 0
-            return number + 0.5
-        except ValueError:
-            return 0.5
-    else:
-        # Extract numeric part from the string
-        try:
-            return float(text.split()[0])
-        except ValueError:
-            return None
-
-# Function to Extract the type of bathroom (remove the number)
-def extract_bathroom_type(text):
-    if pd.isna(text):  # Handle NaN values
-        return None
-    parts = text.split()
-    return " ".join(parts[1:]) if len(parts) > 1 else None
-
-# Apply the functions to create new columns
-listing_data["bathroom_number"] = listing_data["bathrooms_text"].apply(extract_bathrooms_number)
-listing_data["bathroom_type"] = listing_data["bathrooms_text"].apply(extract_bathroom_type)
-
-#Mapping to transform the remaining data label  
-bathroom_type_mapping = {
-    "bath": "bath",
-    "baths": "bath",
-    "half-bath": "bath",  # Include half-bath in the "bath" category
-    "shared bath": "shared bath",
-    "shared baths": "shared bath",
-    "private bath": "private bath"
-}
-# Apply the mapping to the bathroom_type column
-listing_data["bathroom_type"] = listing_data["bathroom_type"].replace(bathroom_type_mapping)
+print("Missing Values in bathrooms_text:", listing_data["bathrooms_text"].isnull().sum())
 
-# Display the grouped counts
-print(listing_data["bathroom_type"].value_counts())
-print("Missing Values in bathroom_number:", listing_data["bathroom_number"].isnull().sum())
-print("Missing Values in bathroom_type:", listing_data["bathroom_type"].isnull().sum())
+def parse_bathrooms(listing_data):
+    # Vectorized parsing (Listing_Parsers.py): number of bathrooms, type mapped to bath / shared bath / private bath
+    # and a shared flag, in one pass. Missing values are imputed with 1 and 'bath'
+    listing_data[["bathroom_number", "bathroom_type", "bathroom_is_shared"]] = parse_bathrooms_text(listing_data["bathrooms_text"])
+    listing_data["bathroom_type"] = to_category(listing_data["bathroom_type"])
 
-# DATA IMPUTATION AFTER TRANSFORMING THE BATHROOM COLUMS
-# Fill missing values in bathroom_number with 1
-listing_data["bathroom_number"] = listing_data["bathroom_number"].fillna(1)
+    #DELETING BATHROOMS_TEXT
+    return listing_data.drop(columns=["bathrooms_text"])
 
-# Fill missing values in bathroom_type with 'bath'
-listing_data["bathroom_type"] = listing_data["bathroom_type"].fillna("bath")
+listing_data = run_stage(pipeline_profile, "bathroom_parsing", stage(parse_bathrooms), listing_data)
+
+# Display the grouped counts
+print(listing_data["bathroom_type"].value_counts())
+print(listing_data["bathroom_is_shared"].value_counts())
 
 # Verify there are no missing values left
 print("Missing Values in bathroom_number:", listing_data["bathroom_number"].isnull().sum())
 print("Missing Values in bathroom_type:", listing_data["bathroom_type"].isnull().sum())
 
-#DELETING BATHROOMS_TEXT
-listing_data = listing_data.drop(columns=["bathrooms_text"])
 # %%  #HOST_LOCATION
-print(listing_data["host_location"].value_counts())
-print("Number of missing host_location DATA :")
-print(listing_data["host_location"].isna().sum())
-#Since the variable doesn't look to be insightful, let's remove it
-listing_data = listing_data.drop(columns="host_location")
+#Since the variable doesn't look to be insightful, it is not loaded (listing_deleted_host_columns in Listing_Schema.py)
 
 # %% HOST_IS_SUPEROST
 #DATA EXPLORATION
@@ -149,72 +165,68 @@ print(missing_superhost["number_of_reviews"].describe())
 print("\nSummary for non-missing superhost values:")
 print(non_missing_superhost["number_of_reviews"].describe())
 
-# Add a column to label missing vs non-missing
-listing_data["superhost_status"] = listing_data["host_is_superhost"].fillna("missing")
-
-# Plot the boxplot
-plt.figure(figsize=(8, 6))
-sns.boxplot(x="superhost_status", y="number_of_reviews", data=listing_data)
-plt.title("Comparison of Number of Reviews by Superhost Status")
-plt.xlabel("Superhost Status")
-plt.ylabel("Number of Reviews")
-plt.show()
-
-# Plot histograms for each group
-plt.figure(figsize=(10, 6))
-sns.histplot(missing_superhost["number_of_reviews"], label="Missing Superhost", color="red", kde=True)
-sns.histplot(non_missing_superhost["number_of_reviews"], label="Non-Missing Superhost", color="blue", kde=True)
-plt.title("Distribution of Number of Reviews")
-plt.xlabel("Number of Reviews")
-plt.ylabel("Frequency")
-plt.legend()
-plt.show()
+if eda_report:
+    # Boxplot with a label for missing vs non-missing
+    add_figure(
+        eda_figures, "superhost_reviews_boxplot", "boxplot",
+        pd.DataFrame({
+            "superhost_status": listing_data["host_is_superhost"].astype("string").fillna("missing"),
+            "number_of_reviews": listing_data["number_of_reviews"],
+        }),
+        x="superhost_status", y="number_of_reviews", figsize=(8, 6),
+        title="Comparison of Number of Reviews by Superhost Status", xlabel="Superhost Status", ylabel="Number of Reviews",
+    )
+    # Histograms for each group
+    add_figure(
+        eda_figures, "superhost_reviews_histogram", "histograms",
+        {"Missing Superhost": missing_superhost["number_of_reviews"], "Non-Missing Superhost": non_missing_superhost["number_of_reviews"]},
+        kde=True, title="Distribution of Number of Reviews", xlabel="Number of Reviews", ylabel="Frequency",
+    )
 
 #PERSONAL NOTE 
-#The majority of host_is_superhost values are f (22,846 out of 34,964 non-missing).
+#The majority of host_is_superhost values are f / False (22,846 out of 34,964 non-missing).
 #No strong evidence that missing values are more likely to be superhosts, 
 
-#it's safer to assume they are not superhosts.
-listing_data["host_is_superhost"] = listing_data["host_is_superhost"].fillna("f")
-# Delete the create superhost_status
-listing_data = listing_data.drop(columns="superhost_status")
+#it's safer to assume they are not superhosts (imputed in the host_features stage).
 
 # %% HOST_ABOUT -- Boolean transformation
-print("Number of missing host_about DATA :")
-print(listing_data["host_about"].isna().sum())
-
-#About half of the data is missing. I will transform the data into a boolean, with True having a description
-listing_data["has_host_description"] = listing_data["host_about"].notnull()
+#About half of the data is missing. The data is transformed into a boolean, with True having a description.
+#The conversion happens while reading (listing_flag_columns in Listing_Schema.py): the text itself is never kept
 print(listing_data["has_host_description"].value_counts())
 
-#DELETE THE HOST_ABOUT
-listing_data = listing_data.drop(columns="host_about")
 
+# %% CALCULATING HOST_TENURE + host rates (HOST FEATURES STAGE)
+def prepare_host_columns(listing_data):
+    #Missing superhost values are assumed not superhosts
+    listing_data["host_is_superhost"] = listing_data["host_is_superhost"].fillna(False)
 
-# %% CALCULATING HOST_TENURE
-#transform host_since in datetime
-listing_data["host_since"] = pd.to_datetime(listing_data["host_since"], errors="coerce")
-print(listing_data["host_since"].dtype)
+    #transform host_since in datetime
+    listing_data["host_since"] = pd.to_datetime(listing_data["host_since"], errors="coerce")
 
-# Calculate host tenure in days
-listing_data["host_tenure"] = (
-    datetime.now() - listing_data["host_since"]
-).dt.days.fillna(0)  # Replace with 0 or another default value
+    # Calculate host tenure in days at the scrape date of the row's snapshot (snapshot_registry.csv),
+    # so the same data always gives the same tenure, whatever the day of the run
+    listing_data["host_tenure"] = (
+        snapshot_dates(listing_data["snapshot"]) - listing_data["host_since"]
+    ).dt.days.fillna(0)  # Replace with 0 or another default value
 
-# %% #EXPLORING MISSINGNESS IN host_data (time, rate, acceptance)
-#Transforming host_reponse_rate and host_acceptance_rate 
-listing_data["host_response_rate"] = (
-    listing_data["host_response_rate"]
-    .str.replace("%", "", regex=False)  # Remove the percentage symbol
-    .astype(float)  # Convert to float
-)
-# Convert host_acceptance_rate to numeric
-listing_data["host_acceptance_rate"] = (
-    listing_data["host_acceptance_rate"]
-    .str.replace("%", "", regex=False)  # Remove the percentage symbol
-    .astype(float)  # Convert to float
-)
+    #Transforming host_reponse_rate and host_acceptance_rate 
+    listing_data["host_response_rate"] = (
+        listing_data["host_response_rate"]
+        .str.replace("%", "", regex=False)  # Remove the percentage symbol
+        .astype(float)  # Convert to float
+    )
+    # Convert host_acceptance_rate to numeric
+    listing_data["host_acceptance_rate"] = (
+        listing_data["host_acceptance_rate"]
+        .str.replace("%", "", regex=False)  # Remove the percentage symbol
+        .astype(float)  # Convert to float
+    )
+    return listing_data
+
+listing_data = run_stage(pipeline_profile, "host_features", stage(prepare_host_columns), listing_data)
+print(listing_data["host_since"].dtype)
 
+# %% #EXPLORING MISSINGNESS IN host_data (time, rate, acceptance)
 #missing values in all 3 columns
 missing_all_three = listing_data[
     listing_data["host_response_time"].isnull() &
@@ -260,56 +272,63 @@ print(non_missing_all_three["number_of_reviews_ltm"].describe())
 
 # %% (Rate, time) Data visualization to see the relationship between missingness and TENURE
 #Step to analyse new users 
-plt.figure(figsize=(10, 6))
-plt.hist(missing_all_three["host_tenure"].dropna(), bins=20, alpha=0.5, label="Missing All Three")
-plt.hist(non_missing_all_three["host_tenure"].dropna(), bins=20, alpha=0.5, label="Non-Missing")
-plt.legend()
-plt.title("Distribution of Host Since Dates")
-plt.xlabel("host_tenure")
-plt.ylabel("Count")
-plt.show()
-
-# Create a new column to mark missing vs non-missing
-listing_data["missing_all_three"] = (
-    listing_data["host_response_time"].isnull() &
-    listing_data["host_response_rate"].isnull() &
-    listing_data["host_acceptance_rate"].isnull()
-)
+if eda_report:
+    add_figure(
+        eda_figures, "host_tenure_histogram", "histograms",
+        {"Missing All Three": missing_all_three["host_tenure"], "Non-Missing": non_missing_all_three["host_tenure"]},
+        bins=20, title="Distribution of Host Since Dates", xlabel="host_tenure", ylabel="Count",
+    )
 
-sns.boxplot(
-    x="missing_all_three",
-    y="host_tenure",
-    data=listing_data
-)
-plt.title("Host Tenure by Missing Status")
-plt.xlabel("Missing All Three (True/False)")
-plt.ylabel("Host Tenure")
-plt.show()
+if eda_report:
+    # Missing vs non-missing mark
+    add_figure(
+        eda_figures, "host_tenure_by_missing_status", "boxplot",
+        pd.DataFrame({
+            "missing_all_three": listing_data.index.isin(missing_all_three.index),
+            "host_tenure": listing_data["host_tenure"],
+        }),
+        x="missing_all_three", y="host_tenure",
+        title="Host Tenure by Missing Status", xlabel="Missing All Three (True/False)", ylabel="Host Tenure",
+    )
 #PERONAL NOTE : Data is not linked to new or inexperienced host
 #Older hosts (joined earlier) are more likely to have missing values in all three columns.
 #Newer hosts (post-2018) are less likely to have missing data.
 
 # %% (Rate, time) FILTERING DATABASE TO ACCOUNT FOR MISSING VALUES IN (rate, time, acceptance)
+#VERIFYING THE REMAINING MISSING VALUE (rows kept by the filter)
+print(non_missing_all_three.shape)
+print(non_missing_all_three[["host_acceptance_rate", "host_response_time", "host_response_rate"]].isna().sum())
+print(non_missing_all_three["host_acceptance_rate"].describe())
+print(non_missing_all_three["host_response_time"].value_counts())
+print(non_missing_all_three["host_response_rate"].value_counts())
+
+# %% (Rate, time) MEDIAN IMPUTATION FOR VALUES IN (Rate, time, acceptance) (HOST IMPUTATION STAGE)
+host_imputation_spec = {
+    "host_response_rate": {"strategy": "median", "by": imputation_by},
+    "host_acceptance_rate": {"strategy": "median", "by": imputation_by},
+    "host_response_time": {"strategy": "constant", "value": "within an hour"},
+}
 
-#FILTERING THE DATASET TO REMOVE ROWS WHERE ALL 3 columns are missing and number of reviews is less than 3 (Removes inactive host)
-listing_data_inactive = listing_data[listing_data['missing_all_three']]
-listing_data = listing_data[~listing_data['missing_all_three']]
 
-#VERIFYING THE REMAINING MISSING VALUE 
-print(listing_data.shape)
-print(listing_data[["host_acceptance_rate", "host_response_time", "host_response_rate"]].isna().sum())
-print(listing_data["host_acceptance_rate"].describe())
-print(listing_data["host_response_time"].value_counts())
-print(listing_data["host_response_rate"].value_counts())
+def impute_host_columns(listing_data):
+    # Create a new column to mark missing vs non-missing
+    listing_data["missing_all_three"] = (
+        listing_data["host_response_time"].isnull() &
+        listing_data["host_response_rate"].isnull() &
+        listing_data["host_acceptance_rate"].isnull()
+    )
 
-# %% (Rate, time) MEDIAN IMPUTATION FOR VALUES IN (Rate, time, acceptance)
-listing_data["host_response_rate"] = listing_data["host_response_rate"].fillna(
-    listing_data["host_response_rate"].median()
-)
-listing_data["host_acceptance_rate"] = listing_data["host_acceptance_rate"].fillna(
-    listing_data["host_acceptance_rate"].median()
-)
-listing_data["host_response_time"] = listing_data["host_response_time"].fillna("within an hour")  
+    #FILTERING THE DATASET TO REMOVE ROWS WHERE ALL 3 columns are missing and number of reviews is less than 3 (Removes inactive host)
+    listing_data_inactive = listing_data[listing_data['missing_all_three']]
+    listing_data = listing_data[~listing_data['missing_all_three']]
+
+    imputation_report, listing_data = impute(listing_data, host_imputation_spec)
+    print_imputation_report(imputation_report, "host rates and response time")
+
+    #DELETE THE CREATED MISSING ALL THREE COLUMNS
+    return listing_data.drop(columns="missing_all_three"), listing_data_inactive
+
+listing_data, listing_data_inactive = run_stage(pipeline_profile, "host_imputation", stage(impute_host_columns), listing_data)
 
 #Last verification to check mon missing value and if the imputation was done correctly 
 print(listing_data[["host_acceptance_rate", "host_response_time", "host_response_rate"]].isna().sum())
@@ -317,9 +336,6 @@ print(listing_data["host_response_rate"].describe())
 print(listing_data["host_acceptance_rate"].describe())
 print(listing_data["host_response_time"].describe())
 
-#DELETE THE CREATED MISSING ALL THREE COLUMNS
-listing_data = listing_data.drop(columns="missing_all_three")
-
 # %% BED and bedrooms columns ANALYSIS
 missing_both = listing_data[listing_data["beds"].isnull() & listing_data["bedrooms"].isnull()]
 print(missing_both.shape)
@@ -328,38 +344,30 @@ print(listing_data["beds"].describe())
 print(listing_data["bedrooms"].describe())
 print(listing_data[["beds", "bedrooms"]].corr())
 
-#PLOT TO UNDERSTAND THE RELATIONSHIP BERWEEN BEDS AND BEDROOMS
-sns.scatterplot(x="bedrooms", y="beds", data=listing_data)
-plt.title("Relationship Between Bedrooms and Beds")
-plt.xlabel("Number of Bedrooms")
-plt.ylabel("Number of Beds")
-plt.show()
+#PLOT TO UNDERSTAND THE RELATIONSHIP BERWEEN BEDS AND BEDROOMS (down-sampled)
+if eda_report:
+    add_figure(
+        eda_figures, "beds_bedrooms_scatter", "scatter",
+        listing_data[["bedrooms", "beds"]],
+        x="bedrooms", y="beds",
+        title="Relationship Between Bedrooms and Beds", xlabel="Number of Bedrooms", ylabel="Number of Beds",
+    )
 
 # %%(Beds & Bedroom)IMPUTATION BY THE AVERAGE BED PER BEDROOM
-# Calculate the ratio of beds to bedrooms (exclude rows with missing values)
-bed_to_bedroom_ratio = listing_data.loc[
-    listing_data["beds"].notnull() & listing_data["bedrooms"].notnull(),
-    "beds"
-].mean() / listing_data.loc[
-    listing_data["beds"].notnull() & listing_data["bedrooms"].notnull(),
-    "bedrooms"
-].mean()
-
-# Impute missing beds based on bedrooms
-listing_data.loc[listing_data["beds"].isnull(), "beds"] = (
-    listing_data["bedrooms"] * bed_to_bedroom_ratio
-)
-# Impute missing bedrooms based on beds
-listing_data.loc[listing_data["bedrooms"].isnull(), "bedrooms"] = (
-    listing_data["beds"] / bed_to_bedroom_ratio)
+# Missing beds from bedrooms (and bedrooms from beds) with the ratio of beds to bedrooms
+# (rows where both are known), rows where both are missing with the median
+bed_imputation_spec = {
+    "beds": [{"strategy": "ratio", "source": "bedrooms", "by": imputation_by}, {"strategy": "median", "by": imputation_by}],
+    "bedrooms": [{"strategy": "ratio", "source": "beds", "by": imputation_by}, {"strategy": "median", "by": imputation_by}],
+}
+
 
+def impute_beds(listing_data):
+    imputation_report, listing_data = impute(listing_data, bed_imputation_spec)
+    print_imputation_report(imputation_report, "beds and bedrooms")
+    return listing_data
 
-#Impute rows where both missing bedrooms and bed with median 
-median_beds = listing_data["beds"].median()
-median_bedrooms = listing_data["bedrooms"].median()
-listing_data.loc[
-    listing_data["beds"].isnull() & listing_data["bedrooms"].isnull(), ["beds", "bedrooms"]
-] = [median_beds, median_bedrooms]
+listing_data = run_stage(pipeline_profile, "bed_imputation", stage(impute_beds), listing_data)
 
 print(listing_data[["beds", "bedrooms"]].isna().sum())
 # %% has availability
@@ -368,17 +376,15 @@ print(listing_data['has_availability'].isna().sum())
 print(listing_data['has_availability'].value_counts())
 
 data_missing_availability = listing_data[listing_data["has_availability"].isna()]
-data_true_availability = listing_data[listing_data["has_availability"] == "t"]
+data_true_availability = listing_data[listing_data["has_availability"].fillna(False)]
 print(data_missing_availability["number_of_reviews_l30d"].describe())
 print(data_true_availability["number_of_reviews_l30d"].describe())
 
 #Lots of availability 0 -- probably inactive -- imput missing with false has availability
-listing_data['has_availability'] = listing_data['has_availability'].fillna("f")
+listing_data['has_availability'] = listing_data['has_availability'].fillna(False)
 
 # %% host_neighborhood
-print(listing_data["host_neighbourhood"].isna().sum())
-listing_data = listing_data.drop(columns="host_neighbourhood")
-## TOO MUCH MISSING VALUE WE DELETE THE COLUMS
+## TOO MUCH MISSING VALUE WE DELETE THE COLUMS (not loaded, listing_deleted_host_columns in Listing_Schema.py)
 
 # %% (REVIEW SCORES) #Analyse missing values for the reviews columns
 # Subset the DataFrame to the desired columns
@@ -425,13 +431,12 @@ print("\nSummary Statistics for Selected Numeric Columns:")
 print(summary_stats)
 
 # Plot histograms for numeric columns in the subset
-for col in numeric_subset.columns:
-    plt.figure()
-    numeric_subset[col].hist(bins=20, edgecolor='black')
-    plt.title(f'Distribution of {col}')
-    plt.xlabel(col)
-    plt.ylabel('Frequency')
-    plt.show()
+if eda_report:
+    for col in numeric_subset.columns:
+        add_figure(
+            eda_figures, f"{col}_histogram", "histograms", {col: numeric_subset[col]},
+            bins=20, figsize=(6.4, 4.8), title=f'Distribution of {col}', xlabel=col, ylabel='Frequency',
+        )
 
 # %% ANALYZING FREQUENCY AND MEAN FOR REVIEW SCORES 
 mean_scores = listing_data[listing_review_columns].mean()
@@ -443,44 +448,46 @@ for col in listing_review_columns:
     print(listing_data[col].value_counts())
     print("\n")
 
-#Boxplot visualization with rating depending on the review score
-melted_data = listing_data[listing_review_columns].melt(var_name="Aspect", value_name="Rating")
-plt.figure(figsize=(10, 6))
-sns.boxplot(x="Aspect", y="Rating", data=melted_data)
-plt.title("Distribution of Ratings Across Different Aspects")
-plt.xlabel("Aspect")
-plt.ylabel("Rating")
-plt.xticks(rotation=45)
-plt.show()    
-
-#Correlation matrix between review scores 
-correlation_matrix = listing_data[listing_review_columns].corr()
-plt.figure(figsize=(8, 6))
-sns.heatmap(correlation_matrix, annot=True, cmap="coolwarm", fmt=".2f")
-plt.title("Correlation Between Review Scores")
-plt.show()
-# %% Looking if missing data in review is associated with missing value in number of review 
-#Check rows where all review columns are missing
-missing_scores = listing_data[listing_review_columns].isnull().all(axis=1)
-
-# Check where the number of reviews is 0 or missing
-no_reviews = listing_data["number_of_reviews"].isnull() | (listing_data["number_of_reviews"] == 0)
-
-# Identify inactive listings
-listing_data["inactive_listing"] = missing_scores & no_reviews
+if eda_report:
+    #Boxplot visualization with rating depending on the review score
+    melted_data = listing_data[listing_review_columns].melt(var_name="Aspect", value_name="Rating")
+    add_figure(
+        eda_figures, "review_scores_boxplot", "boxplot", melted_data,
+        x="Aspect", y="Rating", rotate_xticks=45,
+        title="Distribution of Ratings Across Different Aspects", xlabel="Aspect", ylabel="Rating",
+    )
 
-#Finding the number of rows with no reviews score and no reviews 
-inactive_count = listing_data["inactive_listing"].sum()
-print(f"Number of inactive listings: {inactive_count}")
+    #Correlation matrix between review scores 
+    correlation_matrix = listing_data[listing_review_columns].corr()
+    add_figure(
+        eda_figures, "review_scores_correlation", "heatmap", correlation_matrix,
+        figsize=(8, 6), title="Correlation Between Review Scores",
+    )
+# %% Looking if missing data in review is associated with missing value in number of review (INACTIVE SPLIT STAGE)
+def split_inactive_listings(listing_data, listing_data_inactive):
+    #Check rows where all review columns are missing
+    missing_scores = listing_data[listing_review_columns].isnull().all(axis=1)
+
+    # Check where the number of reviews is 0 or missing
+    no_reviews = listing_data["number_of_reviews"].isnull() | (listing_data["number_of_reviews"] == 0)
+
+    # Identify inactive listings
+    listing_data["inactive_listing"] = missing_scores & no_reviews
 
-listing_data["inactive_listing"] = (missing_scores & no_reviews)
-print(listing_data["inactive_listing"].value_counts())
-# %% KEEPIGN INACTIVE LISTING IN A SEPARATE DATAFRAME (I want to join the data in filtered)
-listing_data_active = listing_data[~listing_data["inactive_listing"]]
-inactive_listings = listing_data[listing_data["inactive_listing"]]
+    # KEEPIGN INACTIVE LISTING IN A SEPARATE DATAFRAME (I want to join the data in filtered)
+    listing_data_active = listing_data[~listing_data["inactive_listing"]]
+    inactive_listings = listing_data[listing_data["inactive_listing"]]
 
-# Concatenate inactive_listings and listing_data_inactive
-all_inactive_listings = pd.concat([inactive_listings, listing_data_inactive], ignore_index=True)
+    # Concatenate inactive_listings and listing_data_inactive
+    all_inactive_listings = pd.concat([inactive_listings, listing_data_inactive], ignore_index=True)
+    return listing_data_active, all_inactive_listings
+
+listing_data_active, all_inactive_listings = run_stage(
+    pipeline_profile, "inactive_split", stage(split_inactive_listings), listing_data, listing_data_inactive
+)
+
+#Finding the number of rows with no reviews score and no reviews 
+print(f"Number of inactive listings: {len(all_inactive_listings) - len(listing_data_inactive)}")
 
 
 #%% Check missing values for active listings 
@@ -511,21 +518,27 @@ print("\nRows where 'first_review', 'last_review', and 'reviews_per_month' are a
 print(all_three_missing)
 
 
-# %%# Select the missing rows from listing_data_active
-missing_rows_condition = (
-    listing_data_active["first_review"].isnull() &
-    listing_data_active["last_review"].isnull() &
-    listing_data_active["reviews_per_month"].isnull()
-)
+# %%# Select the missing rows from listing_data_active (MISSING REVIEW SPLIT STAGE)
+def move_missing_review_rows(listing_data_active, all_inactive_listings):
+    missing_rows_condition = (
+        listing_data_active["first_review"].isnull() &
+        listing_data_active["last_review"].isnull() &
+        listing_data_active["reviews_per_month"].isnull()
+    )
+
+    rows_to_move = listing_data_active[missing_rows_condition]
 
-rows_to_move = listing_data_active[missing_rows_condition]
+    # Add these rows to the inactive_listings DataFrame
+    all_inactive_listings = pd.concat([all_inactive_listings, rows_to_move], ignore_index=True)
 
-# Add these rows to the inactive_listings DataFrame
-all_inactive_listings = pd.concat([all_inactive_listings, rows_to_move], ignore_index=True)
+    # Remove these rows from listing_data_active
+    return listing_data_active[~missing_rows_condition], all_inactive_listings
 
-# Remove these rows from listing_data_active
-listing_data_active = listing_data_active[~missing_rows_condition]
-print(f"Rows moved to inactive_listings: {len(rows_to_move)}")
+inactive_count = len(all_inactive_listings)
+listing_data_active, all_inactive_listings = run_stage(
+    pipeline_profile, "missing_review_split", stage(move_missing_review_rows), listing_data_active, all_inactive_listings
+)
+print(f"Rows moved to inactive_listings: {len(all_inactive_listings) - inactive_count}")
 print(f"Remaining rows in listing_data_active: {len(listing_data_active)}")
 
 # %% IMPUTING THE REMAINING MISSING VALUE IN REVIEW BY THE MEDIAN 
@@ -536,10 +549,16 @@ review_score_cols = [
     "review_scores_location", "review_scores_value"
 ]
 
-# Impute missing values in each column with the column's median
-for col in review_score_cols:
-    median_value = listing_data_active[col].median()  # Calculate median
-    listing_data_active[col] = listing_data_active[col].fillna(median_value)  # Impute missing values
+# Impute missing values in each column with the column's median (all the columns in one pass)
+review_imputation_spec = {col: {"strategy": "median", "by": imputation_by} for col in review_score_cols}
+
+
+def impute_review_scores(listing_data_active):
+    imputation_report, listing_data_active = impute(listing_data_active, review_imputation_spec)
+    print_imputation_report(imputation_report, "review scores")
+    return listing_data_active
+
+listing_data_active = run_stage(pipeline_profile, "review_score_imputation", stage(impute_review_scores), listing_data_active)
 
 # Verify that missing values have been imputed
 print("Missing values after imputation:")
@@ -560,15 +579,47 @@ pd.set_option("display.max_rows", None)  # Show all rows
 # Perform verification on listing_data_active
 verify_data(listing_data_active, "Active Listings")    
 
-# Check for overlaps between active and inactive data
-print("\n--- Checking Overlap Between Active and Inactive Listings ---")
-overlap = pd.merge(listing_data_active, all_inactive_listings, how="inner")
-print(f"Number of overlapping rows: {len(overlap)}")
-if not overlap.empty:
-    print("Overlap Sample:")
-    print(overlap.head())
+# Check for overlaps between active and inactive data, and that together they are the whole population
+# (compared on the (id, quarter) key, hashed once per frame)
+partition_report = validate_partition(
+    listing_population, {"active": listing_data_active, "inactive": all_inactive_listings}, ["id", "quarter"]
+)
+print_partition_report(partition_report, "Active and Inactive Listings")
 
 
 # %% Tranforming the dataframe inactive and actice into a csv (ANALYSIS IN POWERBI IS ONLY WITH ACTIVE LISTINGS)
-all_inactive_listings.to_csv("all_inactive_listings.csv", index=False)
-listing_data_active.to_csv("listing_data_actice.csv", index=False)
+if incremental_mode:
+    # The previous rows of a changed snapshot are replaced
+    for output_file, output_data in [("all_inactive_listings", all_inactive_listings), ("listing_data_actice", listing_data_active)]:
+        remove_snapshots(f"{output_file}.csv", changed_snapshots)
+        append_output(output_data, f"{output_file}.csv")
+else:
+    all_inactive_listings.to_csv("all_inactive_listings.csv", index=False)
+    listing_data_active.to_csv("listing_data_actice.csv", index=False)
+if columnar_output:
+    if incremental_mode:
+        remove_parquet_snapshots("all_inactive_listings.parquet", changed_snapshots)
+        remove_parquet_snapshots("listing_data_active.parquet", changed_snapshots)
+    write_partitioned_parquet(all_inactive_listings, "all_inactive_listings.parquet", append=incremental_mode)
+    write_partitioned_parquet(listing_data_active, "listing_data_active.parquet", append=incremental_mode)
+
+# %% STAR SCHEMA EXPORT (Listing_Star_Schema.py)
+if star_schema_output:
+    star_listings = listing_data_active
+    if incremental_mode:
+        # The dimensions cover every snapshot: the complete active output is read back
+        star_listings = pd.read_csv("listing_data_actice.csv", low_memory=False)
+        star_listings["quarter"] = star_listings["quarter"].astype(quarter_categories())
+    for table_name, table in build_star_schema(star_listings, star_schema_history).items():
+        print(f"{table_name}: {table.shape}")
+        table.to_csv(f"{table_name}.csv", index=False)
+
+#Keeping track of the processed snapshots for the next incremental run
+record_files(listing_Files, listing_outputs)
+
+# %% REPORT STAGE: rendering the queued diagnostic figures (only when eda_report is True)
+if eda_figures:
+    run_stage(pipeline_profile, "eda_report", render_report, eda_figures, "eda_report")
+
+#Profile of the run (pipeline_profiles/listings_<run>.json + listings_profile.csv with every run)
+save_profile(pipeline_profile, "listings")
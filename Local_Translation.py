@@ -0,0 +1,166 @@
+import asyncio
+import json
+import queue
+import threading
+import time
+import torch
+
+#Byte-level vocabulary of the local models: padding, start and end tokens, then the 256 byte values
+pad_id, bos_id, eos_id = 0, 1, 2
+byte_offset = 3
+#Longest input / output of a comment in tokens (bytes), longer comments are cut
+max_tokens = 512
+
+
+def encode_text(text, limit=max_tokens):
+    """
+    Token ids of a text: its UTF-8 bytes (cut to limit - 1) followed by the end token.
+    """
+    return [byte + byte_offset for byte in text.encode("utf-8")[:limit - 1]] + [eos_id]
+
+
+def decode_tokens(ids):
+    """
+    Text of output token ids (up to the first end token, special tokens skipped).
+    """
+    data = bytearray()
+    for token in ids:
+        if token == eos_id:
+            break
+        if token >= byte_offset:
+            data.append(token - byte_offset)
+    return data.decode("utf-8", errors="ignore")
+
+
+def load_local_model(path, threads=None):
+    """
+    Load a TorchScript seq2seq model (torch.jit.save) on CPU. Its forward(tokens, lengths, source, target)
+    takes a padded int64 batch (batch x tokens), the lengths and the language ids, and returns the output
+    token ids (batch x output tokens). The language ids are saved with the model in the extra file languages.json
+    (a multilingual model declares "auto" to accept comments of any language).
+    """
+    if threads:
+        torch.set_num_threads(threads)
+    extra_files = {"languages.json": ""}
+    model = torch.jit.load(path, map_location="cpu", _extra_files=extra_files)
+    model.eval()
+    return model, json.loads(extra_files["languages.json"])
+
+
+def length_buckets(lengths, batch_size=32, max_batch_tokens=8192):
+    """
+    Batches of item positions sorted by length, so that every batch pads its items to similar lengths:
+    at most batch_size items and batch_size x longest length <= max_batch_tokens.
+    """
+    order = sorted(range(len(lengths)), key=lengths.__getitem__)
+    batches, batch = [], []
+    for position in order:
+        if batch and (len(batch) == batch_size or (len(batch) + 1) * lengths[position] > max_batch_tokens):
+            batches.append(batch)
+            batch = []
+        batch.append(position)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def translate_batch(model, languages, texts, source, target):
+    """
+    Translate a list of texts of the same language pair in one forward pass.
+    """
+    encoded = [encode_text(text) for text in texts]
+    lengths = torch.tensor([len(ids) for ids in encoded], dtype=torch.int64)
+    tokens = torch.full((len(encoded), int(lengths.max())), pad_id, dtype=torch.int64)
+    for row, ids in enumerate(encoded):
+        tokens[row, :len(ids)] = torch.tensor(ids, dtype=torch.int64)
+    with torch.inference_mode():
+        output = model(tokens, lengths, languages[source], languages[target])
+    return [decode_tokens(ids) for ids in output.tolist()]
+
+
+def settle(future, result=None, error=None):
+    """
+    Hand a result (or an error) to a waiting coroutine, unless it stopped waiting (timeout).
+    """
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class LocalTranslator:
+    """
+    Local model behind a bounded request queue: one worker thread gathers the pending requests
+    (up to queue_size, waiting at most max_wait seconds for more), groups them by language pair,
+    runs them in length-sorted batches and hands the results back to the waiting coroutines.
+    """
+    def __init__(self, model_path, threads=None, batch_size=32, max_batch_tokens=8192, queue_size=1024, max_wait=0.01):
+        self.model, self.languages = load_local_model(model_path, threads)
+        self.batch_size = batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.max_wait = max_wait
+        self.requests = queue.Queue(maxsize=queue_size)
+        self.stats = {"batches": 0, "texts": 0, "tokens": 0, "padded_tokens": 0}
+        threading.Thread(target=self.work, daemon=True).start()
+
+    def pending(self):
+        """
+        Next requests of the queue: waits for one, then for more until max_wait or a full queue.
+        """
+        requests = [self.requests.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(requests) < self.requests.maxsize:
+            try:
+                requests.append(self.requests.get(timeout=max(0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+        return requests
+
+    def work(self):
+        while True:
+            pairs = {}
+            for request in self.pending():
+                pairs.setdefault(request[1:3], []).append(request)
+            for (source, target), requests in pairs.items():
+                lengths = [min(len(text.encode("utf-8")) + 1, max_tokens) for text, *_ in requests]
+                for batch in length_buckets(lengths, self.batch_size, self.max_batch_tokens):
+                    batch_requests = [requests[position] for position in batch]
+                    try:
+                        if source not in self.languages or target not in self.languages:
+                            raise ValueError(f"Language pair {source} -> {target} not supported by the local model")
+                        results = translate_batch(self.model, self.languages, [text for text, *_ in batch_requests], source, target)
+                    except Exception as error:
+                        for _, _, _, future, loop in batch_requests:
+                            loop.call_soon_threadsafe(settle, future, None, error)
+                        continue
+                    self.stats["batches"] += 1
+                    self.stats["texts"] += len(batch)
+                    self.stats["tokens"] += sum(lengths[position] for position in batch)
+                    self.stats["padded_tokens"] += len(batch) * max(lengths[position] for position in batch)
+                    for (_, _, _, future, loop), result in zip(batch_requests, results):
+                        loop.call_soon_threadsafe(settle, future, result)
+
+    async def translate(self, text, src, dest):
+        """
+        Backend function (same interface as the online backends of Translation_Client.py).
+        A full queue makes the callers wait: the comments in flight never exceed queue_size.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        while True:
+            try:
+                self.requests.put_nowait((text, src, dest, future, loop))
+                break
+            except queue.Full:
+                await asyncio.sleep(self.max_wait)
+        return await future
+
+
+def local_seq2seq_backend(model_path, **options):
+    """
+    Backend running a local TorchScript seq2seq model on CPU (options: threads, batch_size, max_batch_tokens,
+    queue_size, max_wait of LocalTranslator).
+    """
+    return LocalTranslator(model_path, **options).translate
@@ -0,0 +1,185 @@
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from Parallel_Utils import worker_count
+
+#MinHash settings: characters per shingle, hash functions per signature and their seed
+shingle_size = 5
+num_perm = 64
+minhash_seed = 42
+
+
+def shingle_hashes(texts, size=shingle_size):
+    """
+    32-bit hashes of the character shingles (windows of size UTF-8 bytes) of every text, computed for all
+    the texts at once on the concatenated bytes. Texts shorter than a shingle are padded with spaces.
+    Returns the hashes and the number of shingles of every text.
+    """
+    encoded = [text.encode("utf-8").ljust(size) for text in texts]
+    lengths = np.array([len(text) for text in encoded], dtype=np.int64)
+    data = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint64)
+    counts = lengths - size + 1
+    # Start of every window inside the concatenated bytes (never across two texts)
+    text_starts = np.cumsum(lengths) - lengths
+    window_offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    positions = np.repeat(text_starts, counts) + window_offsets
+
+    hashes = np.zeros(len(positions), dtype=np.uint64)
+    for offset in range(size):
+        hashes = hashes * np.uint64(1099511628211) + data[positions + offset]
+    # Bit mixing (splitmix64 finalizer), low 32 bits kept
+    hashes ^= hashes >> np.uint64(31)
+    hashes *= np.uint64(0xBF58476D1CE4E5B9)
+    hashes ^= hashes >> np.uint64(29)
+    return (hashes & np.uint64(0xFFFFFFFF)).astype(np.uint32), counts
+
+
+def minhash_signatures(texts, size=shingle_size, perm=num_perm, seed=minhash_seed):
+    """
+    MinHash signature (texts x perm, uint32) of a list of texts: for every hash function, the minimum
+    over the shingles of each text (np.minimum.reduceat on the text offsets). The hash functions are
+    permutations of the 32-bit values, a * x + b (a odd, wrapping at 2 ** 32) followed by a xorshift,
+    computed in place in uint32.
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(0, 1 << 31, size=perm, dtype=np.uint32) * np.uint32(2) + np.uint32(1)
+    b = rng.integers(0, 1 << 32, size=perm, dtype=np.uint64).astype(np.uint32)
+    hashes, counts = shingle_hashes(texts, size)
+    offsets = np.cumsum(counts) - counts
+    signatures = np.empty((len(counts), perm), dtype=np.uint32)
+    permuted, shifted = np.empty_like(hashes), np.empty_like(hashes)
+    for column in range(perm):
+        np.multiply(hashes, a[column], out=permuted)
+        np.add(permuted, b[column], out=permuted)
+        np.right_shift(permuted, np.uint32(15), out=shifted)
+        np.bitwise_xor(permuted, shifted, out=permuted)
+        signatures[:, column] = np.minimum.reduceat(permuted, offsets)
+    return signatures
+
+
+def minhash_signatures_parallel(texts, max_workers=None, chunk_size=20_000, **options):
+    """
+    MinHash signatures computed in chunks across worker processes (1 worker computes them in this process).
+    max_workers defaults to one process per core where the workers are forked, to this process elsewhere (see worker_count).
+    """
+    texts = list(texts)
+    max_workers = worker_count(max_workers, -(-len(texts) // chunk_size))
+    if max_workers <= 1 or len(texts) <= chunk_size:
+        return minhash_signatures(texts, **options)
+    chunks = [texts[start:start + chunk_size] for start in range(0, len(texts), chunk_size)]
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        return np.concatenate(list(pool.map(_chunk_signatures, chunks, [options] * len(chunks))))
+
+
+def _chunk_signatures(texts, options):
+    return minhash_signatures(texts, **options)
+
+
+def lsh_bands(threshold, perm=num_perm):
+    """
+    Number of bands and rows per band (bands x rows = perm) whose LSH similarity threshold
+    (1 / bands) ** (1 / rows) is the closest to threshold.
+    """
+    divisors = [rows for rows in range(1, perm + 1) if perm % rows == 0]
+    rows = min(divisors, key=lambda rows: abs((1 / (perm // rows)) ** (1 / rows) - threshold))
+    return perm // rows, rows
+
+
+def connected_components(band_labels, n):
+    """
+    Smallest index of the connected component of every item, items sharing a bucket in any band being
+    connected (minimum label propagated through the buckets until it no longer changes).
+    """
+    component = np.arange(n)
+    changed = True
+    while changed:
+        changed = False
+        for labels in band_labels:
+            bucket_min = np.full(labels.max() + 1, n)
+            np.minimum.at(bucket_min, labels, component)
+            propagated = bucket_min[labels]
+            if (propagated < component).any():
+                component = np.minimum(component, propagated)
+                changed = True
+    return component
+
+
+def cluster_comments(texts, groups=None, threshold=0.8, max_workers=None, perm=num_perm):
+    """
+    Near-duplicate clusters of the texts (MinHash over character shingles, LSH banding). Identical texts are
+    hashed once. Only texts of the same group (e.g. the same language) can share a cluster. The representative
+    of a cluster is its most frequent text, and a member whose estimated Jaccard similarity to the
+    representative is under threshold forms its own cluster.
+    Returns a frame aligned to texts: cluster id, representative text and estimated similarity to it.
+    """
+    texts = pd.Series(list(texts), dtype=object)
+    groups = pd.Series(list(groups) if groups is not None else [""] * len(texts), dtype=object)
+    if texts.empty:
+        return pd.DataFrame({"cluster": np.array([], dtype=np.int64), "representative": [], "similarity": []})
+
+    # One entry per distinct (group, text)
+    keys = pd.MultiIndex.from_arrays([groups, texts])
+    codes, distinct = pd.factorize(keys)
+    frequency = np.bincount(codes)
+    distinct_groups = pd.factorize(distinct.get_level_values(0))[0].astype(np.uint64)
+    distinct_texts = distinct.get_level_values(1).tolist()
+    signatures = minhash_signatures_parallel(distinct_texts, max_workers=max_workers, perm=perm)
+
+    # Bucket of every distinct text in every band (band values and group combined into one 64-bit key)
+    bands, rows = lsh_bands(threshold, perm)
+    band_labels = []
+    for band in range(bands):
+        key = distinct_groups * np.uint64(0x9E3779B97F4A7C15)
+        for column in range(band * rows, (band + 1) * rows):
+            key = key * np.uint64(1099511628211) + signatures[:, column].astype(np.uint64)
+        band_labels.append(pd.factorize(key)[0])
+    component = connected_components(band_labels, len(distinct_texts))
+
+    # Most frequent text of each component, members too far from it are split off
+    order = np.lexsort((np.arange(len(component)), -frequency, component))
+    first = np.unique(component[order], return_index=True)[1]
+    representative = np.empty(len(component), dtype=np.int64)
+    representative[np.unique(component)] = order[first]
+    representative = representative[component]
+    similarity = (signatures == signatures[representative]).mean(axis=1)
+    split = similarity < threshold
+    representative[split] = np.flatnonzero(split)
+    similarity[split] = 1.0
+
+    cluster = pd.factorize(representative)[0]
+    return pd.DataFrame({
+        "cluster": cluster[codes],
+        "representative": np.array(distinct_texts, dtype=object)[representative][codes],
+        "similarity": similarity[codes],
+    })
+
+
+def near_duplicate_report(texts, clusters):
+    """
+    Cluster statistics and what translating / storing one representative per cluster saves.
+    """
+    texts = pd.Series(list(texts), dtype=object)
+    sizes = clusters["cluster"].value_counts()
+    distinct_texts = texts.drop_duplicates()
+    representatives = clusters["representative"].drop_duplicates()
+    return {
+        "texts": len(texts),
+        "distinct_texts": len(distinct_texts),
+        "clusters": len(sizes),
+        "clusters_with_variants": int((texts.groupby(clusters["cluster"].to_numpy()).nunique() > 1).sum()),
+        "texts_in_shared_clusters": int(sizes[sizes > 1].sum()),
+        "largest_clusters": sizes.head(5).tolist(),
+        "translations_distinct_texts": len(distinct_texts),
+        "translations_representatives": len(representatives),
+        "chars_distinct_texts": int(distinct_texts.str.len().sum()),
+        "chars_representatives": int(representatives.str.len().sum()),
+    }
+
+
+def print_near_duplicate_report(report):
+    print("--- Near-duplicate comments ---")
+    for name, value in report.items():
+        print(f"{name}: {value}")
+    saved = report["translations_distinct_texts"] - report["translations_representatives"]
+    print(f"Translations saved against one per distinct text: {saved} "
+          f"({saved / max(report['translations_distinct_texts'], 1):.0%})")
@@ -0,0 +1,17 @@
+import multiprocessing
+import os
+
+
+def worker_count(max_workers=None, tasks=None):
+    """
+    Number of worker processes for a pool: max_workers when given, otherwise one per core (capped by the number of tasks).
+    The default only runs in parallel when the workers are forked (Linux): with spawn or forkserver (Windows, macOS)
+    every worker re-imports the calling script, and the scripts run at top level without a __main__ guard,
+    so the work stays in this process. An explicit max_workers > 1 there needs a script with a __main__ guard.
+    """
+    if max_workers is not None:
+        return max_workers
+    if multiprocessing.get_start_method() != "fork":
+        return 1
+    cores = os.cpu_count() or 1
+    return cores if tasks is None else max(1, min(tasks, cores))
@@ -0,0 +1,113 @@
+import json
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+import pandas as pd
+
+#psutil gives the resident memory of the process, when it is installed
+try:
+    import psutil
+except ImportError:
+    psutil = None
+#resource gives the peak resident memory of the process on Linux / macOS
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def rss_mb():
+    """
+    Current resident memory of the process in MB (None without psutil).
+    """
+    if psutil is None:
+        return None
+    return psutil.Process().memory_info().rss / 1e6
+
+
+def peak_rss_mb():
+    """
+    Peak resident memory of the process in MB since its start (None without the resource module).
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+def frame_shape(value):
+    """
+    Rows and columns of a stage input / output: a dataframe, or a tuple of dataframes (rows summed).
+    """
+    frames = [v for v in (value if isinstance(value, tuple) else (value,)) if isinstance(v, pd.DataFrame)]
+    if not frames:
+        return None, None
+    return sum(len(frame) for frame in frames), frames[0].shape[1]
+
+
+def start_profile(trace_memory=False):
+    """
+    Start the profile of a run (list of stage measures). With trace_memory, tracemalloc records the
+    peak memory allocated by each stage, at the cost of a slower run.
+    """
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    return []
+
+
+def run_stage(profile, name, func, *args, **kwargs):
+    """
+    Run one pipeline stage, func(*args, **kwargs), and append its measures to the profile list:
+    wall and CPU time, rows / columns in and out, resident memory after the stage and,
+    when tracemalloc is tracing, the peak memory allocated during the stage.
+    Returns the result of the stage.
+    """
+    rows_in, columns_in = frame_shape(args)
+    trace_memory = tracemalloc.is_tracing()
+    if trace_memory:
+        tracemalloc.reset_peak()
+
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    result = func(*args, **kwargs)
+    wall_time, cpu_time = time.perf_counter() - wall_start, time.process_time() - cpu_start
+
+    rows_out, columns_out = frame_shape(result)
+    profile.append({
+        "stage": name,
+        "wall_s": round(wall_time, 4),
+        "cpu_s": round(cpu_time, 4),
+        "peak_traced_mb": round(tracemalloc.get_traced_memory()[1] / 1e6, 2) if trace_memory else None,
+        "rss_mb": rss_mb(),
+        "peak_rss_mb": peak_rss_mb(),
+        "rows_in": rows_in,
+        "columns_in": columns_in,
+        "rows_out": rows_out,
+        "columns_out": columns_out,
+    })
+    print(f"[stage] {name}: {wall_time:.2f} s wall, {cpu_time:.2f} s CPU, {rows_in} -> {rows_out} rows")
+    return result
+
+
+def save_profile(profile, pipeline, directory="pipeline_profiles"):
+    """
+    Write the profile of a run to {directory}/{pipeline}_{run}.json and append its stages to
+    {directory}/{pipeline}_profile.csv, which keeps every run to compare them.
+    Returns the path of the JSON file.
+    """
+    os.makedirs(directory, exist_ok=True)
+    run = datetime.now().strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(directory, f"{pipeline}_{run}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"pipeline": pipeline, "run": run, "stages": profile}, f, indent=2)
+
+    history = os.path.join(directory, f"{pipeline}_profile.csv")
+    stages = pd.DataFrame(profile)
+    stages.insert(0, "run", run)
+    stages.to_csv(history, mode="a", header=not os.path.exists(history), index=False)
+
+    print(stages.drop(columns="run").to_string(index=False))
+    print(f"Profile written to {path}")
+    return path
@@ -1,31 +1,91 @@
-
-import os
-import unicodedata
+import sys
+from functools import partial
 import pandas as pd
 import numpy as np
-import regex as re
-import torch
-import requests
 from googletrans import Translator
 import googletrans
-from functools import lru_cache
-import time  # Import time for adding delays
+from Columnar_Output import remove_parquet_snapshots, write_partitioned_parquet
+from Language_Filter import bootstrap_language_model, detect_languages, print_routing_report, routing_report, translation_route
+from Local_Translation import local_seq2seq_backend
+from Near_Duplicates import cluster_comments, near_duplicate_report, print_near_duplicate_report
+from Review_Index import drop_snapshots, empty_id_index, load_id_index, print_ingestion_report, read_new_reviews, review_index_file, save_id_index
+from Review_Text import clean_comments_parallel
+from Snapshot_Manifest import load_manifest, pending_files, record_files
+from Translation_Cache import cache_size, cached_translations, open_translation_cache
+from Translation_Client import RateLimiter, googletrans_backend, libretranslate_backend, paraphrase_comments
+from Translation_Results import append_results, assemble_results, load_done_ids, repair_results
 
 translator = Translator()
 print(translator)
 print(googletrans.__version__)  # Ensure it says '4.0.0-rc1'
 
 
+#In chronological order: each review id is credited to the first snapshot that has it
 review_Files = [
     "Raw_Data/reviews_12-2023.csv",
-    "Raw_Data/reviews_06-2024.csv",
     "Raw_Data/reviews_03-2024.csv",
+    "Raw_Data/reviews_06-2024.csv",
     "Raw_Data/reviews_09-2024.csv"
 ]
-
-#Reading, important and concatenating the csv files into a single dataframe
-dataframes_review = [pd.read_csv(file, low_memory=False) for file in review_Files]
-review_data = pd.concat(dataframes_review, ignore_index=True)
+#COLUMNAR OUTPUT: also write the cleaned reviews as a Parquet dataset partitioned by quarter
+columnar_output = False
+#Rows parsed at a time from a snapshot file, only the reviews whose id was never ingested are kept
+review_chunk_size = 200_000
+#Number of worker processes cleaning the comments (None = one per core on Linux, in this process on Windows/macOS
+#where the workers would re-import this script; 1 = sequential)
+clean_workers = None
+
+#INCREMENTAL MODE: only parse the new or changed snapshots (tracked by content hash in snapshot_manifest.json)
+incremental_mode = False
+
+#TRANSLATION CLIENT: request limits of the translation service, comments translated concurrently
+#and timeout of one request (seconds)
+translation_requests_per_second = 3
+translation_requests_per_minute = 180
+translation_concurrency = 4
+translation_timeout = 30
+#LibreTranslate-compatible API used instead of googletrans when set (e.g. "http://localhost:5000")
+translation_api_url = None
+translation_api_key = None
+#Persistent translation cache (SQLite) and its size limit in bytes (least recently used entries removed above it)
+translation_cache_path = "translation_cache.sqlite"
+translation_cache_max_bytes = 500_000_000
+#LANGUAGE PREFILTER: offline language detection of the comments, English comments skip the translator
+#and French comments only need the way back (French -> English)
+language_prefilter = True
+#NEAR-DUPLICATE CLUSTERING: near-identical comments (estimated Jaccard similarity of their character shingles
+#above the threshold) share the translation of one representative (None = every distinct comment is translated)
+near_duplicate_threshold = 0.8
+#LOCAL TRANSLATION MODEL: TorchScript seq2seq model file (Local_Translation.py) used instead of the online services
+#when set, run on CPU with local_model_threads threads, batches of comments of similar length and a bounded queue
+local_model_path = None
+local_model_threads = None
+local_model_batch_size = 32
+local_model_queue_size = 1024
+#Timeout of one local translation (seconds, None = no timeout): it includes the wait behind the queued comments
+local_model_timeout = None
+
+if incremental_mode:
+    review_Files, changed_snapshots = pending_files(review_Files, load_manifest())
+    if not review_Files:
+        print("No new or changed review snapshot to process")
+        sys.exit()
+    if columnar_output:
+        remove_parquet_snapshots("review_data.parquet", changed_snapshots)
+    #Review ids ingested by the previous runs (review_id_index.npz), without those of the changed snapshots read again
+    review_index = drop_snapshots(load_id_index(review_index_file), changed_snapshots)
+else:
+    review_index = empty_id_index()
+
+#Reading the csv files chunk by chunk, keeping only the new review ids (tagged with their snapshot and quarter):
+#the snapshots are cumulative, so every review is kept once, from the first file it appears in
+review_data, review_index, ingestion_report = read_new_reviews(review_Files, review_index, chunk_size=review_chunk_size, low_memory=False)
+print_ingestion_report(ingestion_report, review_index)
+if review_data.empty:
+    print("No new review to process")
+    record_files(review_Files, ["review_data.parquet"] if columnar_output else [])
+    save_id_index(review_index, review_index_file)
+    sys.exit()
 
 #DATA VALIDATION 
 print(review_data.info())
@@ -43,19 +103,7 @@ review_data = review_data[review_data["comments"] != "missing"]
 # Verify remaining data
 print(f"Rows after removing missing comments: {len(review_data)}")
 
-#Check the total number of duplicates
-duplicate_count = review_data.duplicated().sum()
-print(f"Total duplicate rows: {duplicate_count}")
-
-# Display the duplicate rows
-duplicates = review_data[review_data.duplicated()]
-print("Duplicate rows:")
-print(duplicates)
-
-# Keep only the first occurrence
-review_data = review_data.drop_duplicates(keep="first")
-# Verify the result
-print(f"Rows after keeping the first occurrence of duplicates: {len(review_data)}")
+#No duplicate review id left: the ids already read were skipped while reading the files
 
 #Transofrming COLUMNS INTO THE RIGHT DATA TYPE
 # Convert 'date' to datetime format
@@ -64,36 +112,15 @@ review_data["date"] = pd.to_datetime(review_data["date"], errors="coerce")
 #validating the datatype transformation
 print(review_data.info())
 
-#TRANSFORMING THE REVIEW COLUMNS TEXT
-def clean_text(comment):
-    # Normalize text
-    comment = unicodedata.normalize('NFKC', comment)
-
-    # Remove HTML tags
-    comment = re.sub(r"<.*?>", " ", comment)
-
-    # Remove numbers
-    comment = re.sub(r"\d+", "", comment)
-
-    # Remove special characters (except French accents and punctuation)
-    comment = re.sub(r"[^a-zA-Z0-9\s.,!?éèêàçùôöäëïûâ]", "", comment)
-
-    # Convert to lowercase
-    comment = comment.lower()
-
-    # Remove extra spaces
-    comment = re.sub(r"\s+", " ", comment).strip()
-
-    return comment
-
-
 # removing rows with less than 5 caracters 
 review_data = review_data[review_data['comments'].str.len() > 10]
 max_length = 2000
 review_data = review_data[review_data['comments'].str.len() <= max_length]
 
-# Apply to the comments column
-review_data['comments_cleaned'] = review_data['comments'].apply(clean_text)
+#TRANSFORMING THE REVIEW COLUMNS TEXT
+# Same cleaning as clean_text (Review_Text.py): NFKC normalization, HTML tags, numbers and special characters
+# removed (except French accents and punctuation), lowercase and extra spaces, with the fused patterns, in chunks across cores
+review_data['comments_cleaned'] = clean_comments_parallel(review_data['comments'], max_workers=clean_workers)
 review_data["comments_cleaned"] = review_data["comments_cleaned"].astype("string")
 review_data["comments"] = review_data["comments"].fillna("").astype("string")
 print(review_data.dtypes)
@@ -104,40 +131,70 @@ print(review_data['comments_cleaned'].head(100))
 special_chars = review_data['comments_cleaned'].str.contains(r"[^a-zA-Z0-9\s.,!?éèêàçùôöäëïûâ]", regex=True)
 print(review_data[special_chars].head())
 
+if columnar_output:
+    write_partitioned_parquet(review_data, "review_data.parquet", append=incremental_mode)
+
+#Keeping track of the processed snapshots for the next incremental run
+record_files(review_Files, ["review_data.parquet"] if columnar_output else [])
+save_id_index(review_index, review_index_file)
+
 #TRY THE TRANSLATION ON THE SAMPLE DATA
 sample_size = 10000
-sampling_data = review_data[["comments_cleaned"]].head(sample_size)
+sampling_data = review_data[["id", "comments_cleaned"]].head(sample_size)
 
 # %% TRANSLATING WITH GOOGLE API (TRANLSATE AND REPHRASE)
-@lru_cache(maxsize=10000)  # Cache up to 10,000 comments
+#Translations are kept in a persistent SQLite cache, shared by every run and worker process
+translation_cache = open_translation_cache(translation_cache_path)
+
+#Round-trip translation of the sample through the async client: at most translation_concurrency comments
+#in flight, at most translation_requests_per_second / _per_minute requests (slowed down automatically on HTTP 429)
+#Backends: local seq2seq model (CPU, no request limit), LibreTranslate-compatible API or googletrans
+if local_model_path:
+    translation_backend = local_seq2seq_backend(
+        local_model_path, threads=local_model_threads, batch_size=local_model_batch_size, queue_size=local_model_queue_size
+    )
+    translation_limiter = RateLimiter(requests_per_second=float("inf"), requests_per_minute=float("inf"))
+    translation_concurrency = local_model_queue_size
+    translation_timeout = local_model_timeout
+    translation_backend_name = f"local {local_model_path}"
+else:
+    if translation_api_url:
+        translation_backend = libretranslate_backend(translation_api_url, api_key=translation_api_key)
+        translation_backend_name = f"libretranslate {translation_api_url}"
+    else:
+        translation_backend = googletrans_backend(translator)
+        translation_backend_name = "googletrans"
+    translation_limiter = RateLimiter(
+        requests_per_second=translation_requests_per_second, requests_per_minute=translation_requests_per_minute
+    )
+
+def paraphrase_missing(comments, source_lang="auto", intermediate_lang="fr"):
+    """
+    Round-trip translation of the comments missing from the cache.
+    """
+    paraphrased, stats = paraphrase_comments(
+        comments, translation_backend, intermediate_lang=intermediate_lang, source_lang=source_lang,
+        concurrency=translation_concurrency, limiter=translation_limiter, timeout=translation_timeout,
+    )
+    print(f"Translation of {len(comments)} comments: {stats}")
+    return paraphrased
+
 def paraphrase_with_google_cached(comment, intermediate_lang='fr'):
     """
     Paraphrase a single comment using round-trip translation with caching.
     """
-    try:
-        # Step 1: Translate to the intermediate language
-        intermediate = translator.translate(comment, src='auto', dest=intermediate_lang).text
-        
-        # Step 2: Translate back to English
-        paraphrased = translator.translate(intermediate, src=intermediate_lang, dest='en').text
-        
-        return paraphrased
-    except Exception as e:
-        print(f"Error paraphrasing comment: {comment} -> {e}")
-        return comment  # Return the original comment on error
+    return paraphrase_with_google_batch_cached([comment], intermediate_lang)[0]
 
 def paraphrase_with_google_batch_cached(comments_batch, intermediate_lang='fr'):
     """
-    Paraphrase a batch of comments using round-trip translation with caching.
+    Paraphrase a batch of comments using round-trip translation with caching (through the selected backend).
     """
-    paraphrased = []
-    for comment in comments_batch:
-        try:
-            paraphrased.append(paraphrase_with_google_cached(comment, intermediate_lang))
-        except Exception as e:
-            print(f"Error paraphrasing comment in batch: {comment} -> {e}")
-            paraphrased.append(comment)  # Return original comment on error
-    return paraphrased
+    paraphrased, _ = cached_translations(
+        translation_cache, comments_batch, partial(paraphrase_missing, intermediate_lang=intermediate_lang),
+        source_lang="auto", intermediate_lang=intermediate_lang, backend=translation_backend_name, max_bytes=translation_cache_max_bytes,
+    )
+    # Return original comment on error
+    return [comment if text is None else text for comment, text in zip(comments_batch, paraphrased)]
 
 #TEST for one row
 paraphrased_comment = paraphrase_with_google_cached("how is you doing", intermediate_lang='fr')
@@ -147,89 +204,65 @@ comments = ["This is a test.", "buenos dias", "Yet another one."]
 paraphrased_comments = paraphrase_with_google_batch_cached(comments, intermediate_lang='fr')
 print(paraphrased_comments)
 
-# Fixed parameters for processing
-batch_size = 10  # Number of rows per batch
-max_requests_before_pause = 180  # Pause after this many requests
-delay_between_batches = 5 # Fixed delay between each batch (in seconds)
-long_pause_duration = 60  # Pause duration after reaching max_requests_before_pause (in seconds)
-retries = 1  # Number of retry attempts for failed batches
 total_rows = len(sampling_data)  # Total number of rows in your data
-checkpoint_file = "checkpoint.txt"  # To track the last completed batch
+batch_size = 500  # Comments per batch, each completed batch is appended to the results file
+results_file = "paraphrase_results.jsonl"  # Append-only results, one JSON line per review id
 output_file = "processed_data.csv"  # To save the processed results
 
-# Function to load the last checkpoint
-def load_last_checkpoint():
-    if os.path.exists(checkpoint_file):
-        with open(checkpoint_file, "r") as f:
-            return int(f.read().strip())
-    return 0  # Start from the first batch if no checkpoint exists
-
-# Function to save the checkpoint
-def save_checkpoint(batch_num):
-    with open(checkpoint_file, "w") as f:
-        f.write(str(batch_num))
-
-# Load the last processed batch
-start_batch = load_last_checkpoint()
-
-# Track the total number of requests sent
-total_requests_sent = 0
-
-# Calculate the number of batches
-num_batches = len(sampling_data) // batch_size + (1 if len(sampling_data) % batch_size != 0 else 0)
-
-for i in range(num_batches):
-    start = i * batch_size
-    end = min((i + 1) * batch_size, len(sampling_data))
-    print(f"Processing batch {i + 1}/{num_batches} (rows {start} to {end - 1})...")
-
-    # Extract the current batch
-    comments_batch = sampling_data['comments_cleaned'].iloc[start:end].tolist()
-
-    # Flag to track batch success
-    success = False
-    paraphrased_batch = []
-
-    try:
-        # Retry loop for the batch
-        for attempt in range(retries):
-            try:
-                paraphrased_batch = paraphrase_with_google_batch_cached(comments_batch, intermediate_lang='fr')
-                if len(paraphrased_batch) == len(comments_batch):
-
-                    success = True
-                    break  # Exit retry loop if successful
-                else:
-                    print(f"Batch size mismatch in batch {i + 1}: "
-                          f"Expected {len(comments_batch)}, got {len(paraphrased_batch)}. Retrying...")
-            except Exception as e:
-                print(f"Error in batch {i + 1}, attempt {attempt + 1}: {e}")
-                if attempt < retries - 1:
-                    print("Retrying after 10 seconds...")
-                    time.sleep(10)  # Retry delay
-                else:
-                    print(f"Max retries reached for batch {i + 1}. Skipping batch.")
-        # Handle the batch if it succeeded or failed
-        if success:
-            # Assign translated results back to the DataFrame
-            sampling_data.loc[start:end - 1, 'comments_paraphrased'] = paraphrased_batch
-        else:
-            # Log the skipped batch
-            print(f"Skipping batch {i + 1}. Assigning None for all rows in this batch.")
-            sampling_data.loc[start:end - 1, 'comments_paraphrased'] = [None] * len(comments_batch)
-
-        # Track total requests sent and handle pauses
-        total_requests_sent += len(comments_batch)
-        if total_requests_sent >= max_requests_before_pause:
-            print(f"Reached {max_requests_before_pause} requests. Pausing for {long_pause_duration} seconds...")
-            time.sleep(long_pause_duration)
-            total_requests_sent = 0  # Reset counter after pause
-        else:
-            time.sleep(delay_between_batches)  # Fixed delay between batches
-
-    except Exception as fatal_error:
-        # Handle any fatal error that would crash the loop
-        print(f"Critical error in batch {i + 1}: {fatal_error}")
-        print("Skipping this batch and continuing with the next...")
+# Resuming: the reviews already in the results file are skipped (a line left half written by a crash is removed first)
+repair_results(results_file)
+done_ids = load_done_ids(results_file)
+pending_data = sampling_data[~sampling_data["id"].isin(list(done_ids))]
+print(f"{len(done_ids)} reviews already paraphrased, {len(pending_data)} to process")
+
+#Language of every comment (character n-gram model adapted to the sample), and the translator work it needs
+if language_prefilter:
+    language_model = bootstrap_language_model(sampling_data["comments_cleaned"])
+    pending_data = pending_data.assign(language=detect_languages(pending_data["comments_cleaned"], language_model)["language"].to_numpy())
+else:
+    pending_data = pending_data.assign(language="unknown")
+pending_data["route"] = pending_data["language"].map(translation_route)
+print_routing_report(routing_report(pending_data["language"]))
+
+#Near-identical comments of the same language are translated once (MinHash / LSH clusters, shingled across cores)
+if near_duplicate_threshold is not None:
+    comment_clusters = cluster_comments(
+        pending_data["comments_cleaned"], groups=pending_data["language"], threshold=near_duplicate_threshold, max_workers=clean_workers
+    )
+    pending_data["representative"] = comment_clusters["representative"].to_numpy()
+    print_near_duplicate_report(near_duplicate_report(pending_data["comments_cleaned"], comment_clusters))
+else:
+    pending_data["representative"] = pending_data["comments_cleaned"]
+
+num_batches = -(-len(pending_data) // batch_size)
+for i, start in enumerate(range(0, len(pending_data), batch_size)):
+    batch = pending_data.iloc[start:start + batch_size]
+    comments = batch["comments_cleaned"].to_numpy(dtype=object)
+    representatives = batch["representative"].to_numpy(dtype=object)
+    routes = batch["route"].to_numpy()
+    # English comments are kept as they are, French comments only make the way back
+    paraphrased = np.where(routes == "skip", comments, None)
+    for route, source_lang in [("from_intermediate", "fr"), ("round_trip", "auto")]:
+        rows = routes == route
+        if not rows.any():
+            continue
+        # Only the cluster representatives missing from the cache are sent to the translation service
+        paraphrased[rows], cache_stats = cached_translations(
+            translation_cache, representatives[rows], partial(paraphrase_missing, source_lang=source_lang), source_lang=source_lang,
+            intermediate_lang="fr", backend=translation_backend_name, max_bytes=translation_cache_max_bytes,
+        )
+        print(f"Batch {i + 1}/{num_batches}, {route}: cache {cache_stats}")
+    # Comments that could not be translated are not recorded, the next run retries them
+    append_results([
+        {"id": review_id, "language": language, "comments_cleaned": comment, "comments_paraphrased": text}
+        for review_id, language, comment, text in zip(batch["id"].tolist(), batch["language"].tolist(), comments, paraphrased)
+        if text is not None
+    ], results_file)
+
+print(f"Translation cache: {cache_size(translation_cache)}")
+
+# Final output streamed from the results file
+paraphrased_rows = assemble_results(output_file, results_file, columns=("id", "language", "comments_cleaned", "comments_paraphrased"))
+print(f"{paraphrased_rows} paraphrased reviews written to {output_file}")
 
 print("Processing complete!")
@@ -0,0 +1,107 @@
+import os
+import numpy as np
+import pandas as pd
+from Snapshot_Utils import load_snapshot_registry, snapshot_from_file, tag_snapshot
+
+#On-disk index of the ingested review ids: sorted int64 ids and the snapshot each id was first read from
+review_index_file = "review_id_index.npz"
+#Rows parsed at a time from a reviews file
+review_chunk_size = 200_000
+
+
+def empty_id_index():
+    return {"ids": np.array([], dtype=np.int64), "snapshots": np.array([], dtype=np.int16), "labels": []}
+
+
+def load_id_index(path=review_index_file):
+    if not os.path.exists(path):
+        return empty_id_index()
+    with np.load(path) as stored:
+        return {"ids": stored["ids"], "snapshots": stored["snapshots"], "labels": stored["labels"].tolist()}
+
+
+def save_id_index(index, path=review_index_file):
+    # Written to a temporary file first so a crash never leaves a half-written index
+    temporary = f"{path}.tmp.npz"
+    np.savez(temporary, ids=index["ids"], snapshots=index["snapshots"], labels=np.array(index["labels"], dtype=str))
+    os.replace(temporary, path)
+
+
+def known_ids(index, ids):
+    """
+    Boolean mask of the ids already in the index (binary search in the sorted ids).
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    positions = np.searchsorted(index["ids"], ids)
+    found = positions < len(index["ids"])
+    found[found] = index["ids"][positions[found]] == ids[found]
+    return found
+
+
+def add_ids(index, ids, snapshot):
+    """
+    Index with new (unique, unknown) ids of a snapshot merged in, still sorted.
+    """
+    labels = list(index["labels"])
+    if snapshot not in labels:
+        labels.append(snapshot)
+    ids = np.sort(np.asarray(ids, dtype=np.int64))
+    # Sorted insertion (linear) instead of sorting the whole index again
+    positions = np.searchsorted(index["ids"], ids)
+    return {
+        "ids": np.insert(index["ids"], positions, ids),
+        "snapshots": np.insert(index["snapshots"], positions, np.int16(labels.index(snapshot))),
+        "labels": labels,
+    }
+
+
+def drop_snapshots(index, snapshots):
+    """
+    Index without the ids first read from the given snapshots (their files changed and are read again).
+    """
+    codes = [code for code, label in enumerate(index["labels"]) if label in set(snapshots)]
+    keep = ~np.isin(index["snapshots"], codes)
+    return {"ids": index["ids"][keep], "snapshots": index["snapshots"][keep], "labels": index["labels"]}
+
+
+def chronological_files(files):
+    """
+    Files in the order of their snapshot in the registry (unknown snapshots last, in their given order).
+    """
+    order = {snapshot: position for position, snapshot in enumerate(load_snapshot_registry()["snapshot"])}
+    return sorted(files, key=lambda file: order.get(snapshot_from_file(file), len(order)))
+
+
+def read_new_reviews(files, index, chunk_size=review_chunk_size, **read_kwargs):
+    """
+    Read the reviews files chunk by chunk and keep only the reviews whose id is not in the index yet
+    (review id = primary key: the cumulative snapshots repeat most of the previous reviews).
+    Every chunk is filtered before the next one is read, so memory grows with the new reviews only.
+    The files are read in chronological order, so each review is credited to the first snapshot that has it.
+    Returns the new reviews (tagged with their snapshot and quarter), the updated index and a report per file.
+    """
+    frames, report = [], []
+    for file in chronological_files(files):
+        snapshot = snapshot_from_file(file)
+        counts = {"file": file, "rows": 0, "already_ingested": 0, "repeated_in_file": 0, "new": 0}
+        for chunk in pd.read_csv(file, chunksize=chunk_size, dtype={"id": "int64"}, **read_kwargs):
+            counts["rows"] += len(chunk)
+            known = known_ids(index, chunk["id"].to_numpy())
+            counts["already_ingested"] += int(known.sum())
+            chunk = chunk[~known]
+            repeated = chunk["id"].duplicated()
+            counts["repeated_in_file"] += int(repeated.sum())
+            chunk = chunk[~repeated]
+            counts["new"] += len(chunk)
+            index = add_ids(index, chunk["id"].to_numpy(), snapshot)
+            frames.append(tag_snapshot(chunk, file))
+        report.append(counts)
+    reviews = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    return reviews, index, pd.DataFrame(report)
+
+
+def print_ingestion_report(report, index):
+    print("--- Review ingestion by id ---")
+    print(report.to_string(index=False))
+    print(f"New reviews: {int(report['new'].sum())} of {int(report['rows'].sum())} rows read, "
+          f"{len(index['ids'])} review ids in the index")
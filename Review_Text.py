@@ -0,0 +1,83 @@
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import regex as re
+from Parallel_Utils import worker_count
+
+#Patterns of the comment cleaning, compiled once
+html_tag_pattern = re.compile(r"<.*?>")
+#Digits and special characters (except French accents and punctuation) removed in one pass:
+#digits are removed anyway, so they are left out of the kept characters
+removed_chars_pattern = re.compile(r"[^a-zA-Z\s.,!?éèêàçùôöäëïûâ]+")
+#Same removal and lowercase for ASCII comments, as one str.translate table
+ascii_clean_table = {
+    code: (chr(code).lower() if removed_chars_pattern.fullmatch(chr(code)) is None else None) for code in range(128)
+}
+
+
+# Function to clean a review comment (row-wise reference implementation)
+def clean_text(comment):
+    # Normalize text
+    comment = unicodedata.normalize('NFKC', comment)
+
+    # Remove HTML tags
+    comment = re.sub(r"<.*?>", " ", comment)
+
+    # Remove numbers
+    comment = re.sub(r"\d+", "", comment)
+
+    # Remove special characters (except French accents and punctuation)
+    comment = re.sub(r"[^a-zA-Z0-9\s.,!?éèêàçùôöäëïûâ]", "", comment)
+
+    # Convert to lowercase
+    comment = comment.lower()
+
+    # Remove extra spaces
+    comment = re.sub(r"\s+", " ", comment).strip()
+
+    return comment
+
+
+def clean_comment(comment):
+    """
+    Same result as clean_text, with the precompiled patterns and fewer passes:
+    ASCII comments skip the NFKC normalization (it does not change them) and are cleaned with one
+    translate table, the tag pattern only runs when there is a "<", and the numbers and special
+    characters are removed together.
+    The kept whitespace characters are exactly those str.split() splits on, so split / join collapses them.
+    """
+    if not comment.isascii():
+        comment = unicodedata.normalize("NFKC", comment)
+    if "<" in comment:
+        comment = html_tag_pattern.sub(" ", comment)
+    if comment.isascii():
+        # Removal and lowercase in one table lookup
+        return " ".join(comment.translate(ascii_clean_table).split())
+    # Only A-Z is changed by lower() among the kept characters
+    return " ".join(removed_chars_pattern.sub("", comment).lower().split())
+
+
+def clean_comments(comments):
+    """
+    Clean a whole array / Series of comments (list of cleaned comments, or a Series with the same index).
+    """
+    cleaned = [clean_comment(comment) for comment in comments]
+    if isinstance(comments, pd.Series):
+        return pd.Series(cleaned, index=comments.index, name=comments.name)
+    return cleaned
+
+
+def clean_comments_parallel(comments, max_workers=None, chunk_size=50_000):
+    """
+    Clean a Series of comments split in chunks across worker processes (1 worker cleans in this process).
+    max_workers defaults to one process per core where the workers are forked, to this process elsewhere (see worker_count).
+    """
+    max_workers = worker_count(max_workers, -(-len(comments) // chunk_size))
+    if max_workers <= 1 or len(comments) <= chunk_size:
+        return clean_comments(comments)
+
+    values = comments.tolist()
+    chunks = [values[start:start + chunk_size] for start in range(0, len(values), chunk_size)]
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        cleaned = [comment for chunk in pool.map(clean_comments, chunks) for comment in chunk]
+    return pd.Series(cleaned, index=comments.index, name=comments.name)
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+import pandas as pd
+from Snapshot_Utils import snapshot_from_file
+
+#Manifest of the raw files already processed (shared by all the scripts)
+manifest_file = "snapshot_manifest.json"
+
+
+def file_hash(path, block_size=1 << 20):
+    """
+    SHA-256 of a file's content, read block by block.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(path=manifest_file):
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            return json.load(f)
+    return {}
+
+
+def save_manifest(manifest, path=manifest_file):
+    # Written to a temporary file first so a crash never leaves a half-written manifest
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temporary, path)
+
+
+def is_processed(file, manifest):
+    """
+    True when the file is in the manifest with the same content.
+    Size and modification time are compared first, the file is only hashed when they changed.
+    """
+    entry = manifest.get(file)
+    if entry is None:
+        return False
+    stat = os.stat(file)
+    if entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+        return True
+    return entry["hash"] == file_hash(file)
+
+
+def pending_files(files, manifest):
+    """
+    Split the raw files into those to process (new or changed) and the snapshots whose
+    previous output has to be replaced (changed files).
+    """
+    pending = [file for file in files if not is_processed(file, manifest)]
+    changed_snapshots = [snapshot_from_file(file) for file in pending if file in manifest]
+    return pending, changed_snapshots
+
+
+def record_files(files, outputs, path=manifest_file):
+    """
+    Add the processed files and their cleaned outputs to the manifest.
+    The manifest is reloaded first so scripts running one after another do not overwrite each other.
+    """
+    manifest = load_manifest(path)
+    for file in files:
+        stat = os.stat(file)
+        manifest[file] = {
+            "hash": file_hash(file),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "snapshot": snapshot_from_file(file),
+            "outputs": list(outputs),
+            "processed_at": datetime.now().isoformat(timespec="seconds"),
+        }
+    save_manifest(manifest, path)
+
+
+def remove_snapshots(output_file, snapshots, chunk_size=1_000_000):
+    """
+    Rewrite a csv output without the rows of the given snapshots, chunk by chunk.
+    """
+    if not snapshots or not os.path.exists(output_file):
+        return
+    temporary = f"{output_file}.tmp"
+    header = True
+    for chunk in pd.read_csv(output_file, chunksize=chunk_size, low_memory=False):
+        chunk = chunk[~chunk["snapshot"].astype(str).isin(snapshots)]
+        chunk.to_csv(temporary, mode="w" if header else "a", header=header, index=False)
+        header = False
+    os.replace(temporary, output_file)
+
+
+def append_output(df, output_file, key=None):
+    """
+    Append new rows to an existing csv output (created when missing).
+    With a key the output is re-deduplicated on it, the new rows winning.
+    """
+    if not os.path.exists(output_file):
+        df.to_csv(output_file, index=False)
+    elif key is not None:
+        existing = pd.read_csv(output_file, low_memory=False)
+        combined = pd.concat([existing, df], ignore_index=True)
+        combined.drop_duplicates(subset=key, keep="last").to_csv(output_file, index=False)
+    else:
+        # Only the rows are appended, in the column order of the existing file
+        header = pd.read_csv(output_file, nrows=0).columns
+        df.reindex(columns=header).to_csv(output_file, mode="a", header=False, index=False)
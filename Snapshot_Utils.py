@@ -0,0 +1,105 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import pandas as pd
+from Parallel_Utils import worker_count
+
+#One row per snapshot: label of the raw files, quarter label and range of scrape dates.
+#Adding a snapshot only means adding a row to this file.
+registry_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshot_registry.csv")
+
+
+@lru_cache(maxsize=None)
+def load_snapshot_registry(path=registry_file):
+    registry = pd.read_csv(path, dtype={"snapshot": "string", "quarter": "string"}, parse_dates=["scraped_from", "scraped_to"])
+    return registry.sort_values("scraped_from", ignore_index=True)
+
+
+def quarter_categories():
+    """
+    Ordered quarter categories (chronological, "Unknown" last).
+    """
+    quarters = list(load_snapshot_registry()["quarter"]) + ["Unknown"]
+    return pd.CategoricalDtype(quarters, ordered=True)
+
+
+def snapshot_categories():
+    """
+    Ordered snapshot categories (chronological order of the registry).
+    """
+    return pd.CategoricalDtype(list(load_snapshot_registry()["snapshot"]), ordered=True)
+
+
+def snapshot_from_file(file):
+    """
+    Extract the snapshot label (e.g. "12-2023") from a raw file name.
+    """
+    match = re.search(r"(\d{2}-\d{4})", os.path.basename(file))
+    return match.group(1) if match else "Unknown"
+
+
+def quarter_from_file(file):
+    """
+    Quarter label of the snapshot a raw file belongs to.
+    """
+    registry = load_snapshot_registry().set_index("snapshot")
+    snapshot = snapshot_from_file(file)
+    return registry.at[snapshot, "quarter"] if snapshot in registry.index else "Unknown"
+
+
+def quarters_from_dates(dates):
+    """
+    Vectorized lookup of the quarter of each scrape date in the registry ranges.
+    Dates outside every range are labelled "Unknown".
+    """
+    registry = load_snapshot_registry()
+    ranges = pd.IntervalIndex.from_arrays(registry["scraped_from"], registry["scraped_to"], closed="both")
+    positions = ranges.get_indexer(pd.to_datetime(dates).dt.normalize())
+    codes = pd.Series(positions, index=dates.index)
+    quarters = pd.Categorical.from_codes(codes.where(codes >= 0, len(registry)).to_numpy(), dtype=quarter_categories())
+    return pd.Series(quarters, index=dates.index, name="quarter")
+
+
+def snapshot_dates(snapshots, column="scraped_to"):
+    """
+    Registry scrape date of each row's snapshot (NaT for unregistered snapshots).
+    Used as the reference date of time-relative features, so they do not change with the day of the run.
+    """
+    dates = load_snapshot_registry().set_index("snapshot")[column]
+    return pd.to_datetime(snapshots.astype("string").map(dates))
+
+
+def tag_snapshot(frame, file):
+    """
+    Tag every row with the snapshot and quarter of its source file.
+    """
+    frame["snapshot"] = snapshot_from_file(file)
+    frame["quarter"] = pd.Series(quarter_from_file(file), index=frame.index, dtype=quarter_categories())
+    return frame
+
+
+def read_snapshot(file, reader=pd.read_csv, **read_kwargs):
+    """
+    Read one snapshot file and tag its rows with their source snapshot and quarter.
+    """
+    return tag_snapshot(reader(file, **read_kwargs), file)
+
+
+def load_snapshots(files, reader=pd.read_csv, max_workers=None, **read_kwargs):
+    """
+    Parse the snapshot files in parallel worker processes and concatenate them.
+    The reader (pd.read_csv, gpd.read_file...) and its keyword arguments are sent to every worker.
+    max_workers defaults to one process per file (capped by the number of cores) where the workers are forked,
+    and to reading in this process elsewhere (see worker_count); 1 reads sequentially.
+    """
+    max_workers = worker_count(max_workers, len(files))
+
+    if max_workers <= 1:
+        frames = [read_snapshot(file, reader, **read_kwargs) for file in files]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(read_snapshot, file, reader, **read_kwargs) for file in files]
+            frames = [future.result() for future in futures]
+
+    return pd.concat(frames, ignore_index=True)
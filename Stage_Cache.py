@@ -0,0 +1,115 @@
+import functools
+import hashlib
+import inspect
+import json
+import os
+import pandas as pd
+
+#On-disk cache of the pipeline stage outputs (one pickle per entry, shared by all the scripts)
+cache_directory = "stage_cache"
+#Total size kept on disk, the least recently used entries are removed above it
+cache_max_bytes = 2_000_000_000
+
+
+def value_digest(value):
+    """
+    SHA-256 of a stage input or parameter: dataframes and series by their content (values, index,
+    columns and dtypes), anything else by its JSON text.
+    """
+    digest = hashlib.sha256()
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        frame = value.to_frame() if isinstance(value, pd.Series) else value
+        digest.update(json.dumps([[str(col), str(dtype)] for col, dtype in frame.dtypes.items()]).encode())
+        digest.update(pd.util.hash_pandas_object(frame, index=True).to_numpy().tobytes())
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            digest.update(value_digest(item).encode())
+    else:
+        digest.update(json.dumps(value, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def code_digest(func, seen=None):
+    """
+    SHA-256 of the source of a stage function and of what it uses from the pipeline code:
+    the functions of the project modules it calls (followed recursively) and the
+    module-level settings it reads (column lists, mappings...).
+    """
+    seen = set() if seen is None else seen
+    seen.add(func)
+    try:
+        root = os.path.dirname(os.path.abspath(inspect.getsourcefile(func)))
+        digest = hashlib.sha256(inspect.getsource(func).encode())
+    except (OSError, TypeError):
+        # No source file (function defined in an interactive session): compiled code instead
+        root = None
+        digest = hashlib.sha256(func.__code__.co_code + repr(func.__code__.co_consts).encode())
+
+    for name in sorted(set(func.__code__.co_names)):
+        if name not in func.__globals__:
+            continue
+        value = func.__globals__[name]
+        if inspect.isfunction(value):
+            source = inspect.getsourcefile(value)
+            source = os.path.dirname(os.path.abspath(source)) if source else None
+            if value not in seen and (source == root or value.__module__ == func.__module__):
+                digest.update(code_digest(value, seen).encode())
+        elif isinstance(value, (str, int, float, bool, list, tuple, dict, set)):
+            digest.update(name.encode())
+            digest.update(value_digest(sorted(value) if isinstance(value, set) else value).encode())
+    return digest.hexdigest()
+
+
+def stage_key(func, args, kwargs, params):
+    """
+    Cache key of a stage run: hash of its input data, its parameters and its code version.
+    """
+    digest = hashlib.sha256(code_digest(func).encode())
+    for value in args:
+        digest.update(value_digest(value).encode())
+    for name, value in sorted({**kwargs, **params}.items()):
+        digest.update(name.encode())
+        digest.update(value_digest(value).encode())
+    return digest.hexdigest()[:32]
+
+
+def evict_cache(directory=cache_directory, max_bytes=cache_max_bytes):
+    """
+    Remove the least recently used entries until the cache fits in max_bytes.
+    """
+    if not os.path.isdir(directory):
+        return
+    entries = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".pkl")]
+    entries = sorted(entries, key=os.path.getmtime, reverse=True)
+    total = 0
+    for path in entries:
+        total += os.path.getsize(path)
+        if total > max_bytes:
+            os.remove(path)
+
+
+def cached(func, directory=cache_directory, max_bytes=cache_max_bytes, **params):
+    """
+    Wrap a stage function so its output is read from the cache when the same stage code already ran
+    on the same inputs with the same parameters. params are extra key parts for what the stage
+    reads outside of its arguments (e.g. the snapshot registry).
+    The key is computed before the stage runs, so stages may change their inputs in place.
+    """
+    @functools.wraps(func)
+    def cached_func(*args, **kwargs):
+        key = stage_key(func, args, kwargs, params)
+        path = os.path.join(directory, f"{func.__name__}-{key}.pkl")
+        if os.path.exists(path):
+            os.utime(path)  # Most recently used entry
+            print(f"[cache] {func.__name__}: output reused from {path}")
+            return pd.read_pickle(path)
+
+        result = func(*args, **kwargs)
+        os.makedirs(directory, exist_ok=True)
+        # Written to a temporary file first so a crash never leaves a half-written entry
+        temporary = f"{path}.tmp"
+        pd.to_pickle(result, temporary)
+        os.replace(temporary, path)
+        evict_cache(directory, max_bytes)
+        return result
+    return cached_func
@@ -0,0 +1,132 @@
+import hashlib
+import sqlite3
+import time
+import unicodedata
+
+#Persistent cache of the translations (one SQLite file shared by every run and worker process)
+translation_cache_file = "translation_cache.sqlite"
+#Total size of the cached texts, the least recently used entries are removed above it
+translation_cache_max_bytes = 500_000_000
+#Largest number of keys in one SQL statement (SQLite limit on the query parameters)
+lookup_chunk_size = 900
+
+
+def normalize_text(text):
+    """
+    Text used for the cache key: NFKC form with the whitespace collapsed.
+    """
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def translation_key(text, source_lang, intermediate_lang, backend):
+    """
+    SHA-256 of the normalized text, the languages and the backend name.
+    """
+    fields = [normalize_text(text), source_lang, intermediate_lang, backend]
+    return hashlib.sha256("\x1f".join(fields).encode("utf-8")).hexdigest()
+
+
+def open_translation_cache(path=translation_cache_file):
+    """
+    Open (create) the cache. WAL journal: readers never block the writer, and concurrent
+    writers (other runs or workers) wait for each other up to the busy timeout.
+    """
+    connection = sqlite3.connect(path, timeout=60)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS translations ("
+        "key TEXT PRIMARY KEY, translation TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+    )
+    connection.execute("CREATE INDEX IF NOT EXISTS translations_last_used ON translations (last_used)")
+    connection.commit()
+    return connection
+
+
+def cache_get_many(connection, keys):
+    """
+    Bulk lookup of a batch of keys, returns {key: translation} for the keys found (and marks them as used).
+    """
+    keys = list(dict.fromkeys(keys))
+    found = {}
+    now = time.time()
+    with connection:
+        for start in range(0, len(keys), lookup_chunk_size):
+            chunk = keys[start:start + lookup_chunk_size]
+            marks = ",".join("?" * len(chunk))
+            found.update(connection.execute(f"SELECT key, translation FROM translations WHERE key IN ({marks})", chunk))
+            connection.execute(f"UPDATE translations SET last_used = ? WHERE key IN ({marks})", [now, *chunk])
+    return found
+
+
+def cache_put_many(connection, translations):
+    """
+    Store {key: translation} in one transaction.
+    """
+    now = time.time()
+    with connection:
+        connection.executemany(
+            "INSERT OR REPLACE INTO translations (key, translation, size, last_used) VALUES (?, ?, ?, ?)",
+            [(key, text, len(key) + len(text.encode("utf-8")), now) for key, text in translations.items()],
+        )
+
+
+def cache_size(connection):
+    """
+    Number of entries and bytes of the cache.
+    """
+    entries, size = connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM translations").fetchone()
+    return {"entries": entries, "bytes": size}
+
+
+def evict_translation_cache(connection, max_bytes=translation_cache_max_bytes):
+    """
+    Remove the least recently used entries until the cache holds at most max_bytes, returns the number removed.
+    """
+    excess = cache_size(connection)["bytes"] - max_bytes
+    if excess <= 0:
+        return 0
+    removed, freed = [], 0
+    for key, size in connection.execute("SELECT key, size FROM translations ORDER BY last_used"):
+        if freed >= excess:
+            break
+        removed.append((key,))
+        freed += size
+    with connection:
+        connection.executemany("DELETE FROM translations WHERE key = ?", removed)
+    return len(removed)
+
+
+def cached_translations(connection, texts, translate, source_lang="auto", intermediate_lang="fr", backend="googletrans",
+                        max_bytes=translation_cache_max_bytes):
+    """
+    Translations of texts through the cache: the distinct texts are looked up in one bulk query, only the
+    misses are passed to translate (function: list of texts -> list of translations, None for a failure)
+    and its successful results are stored. Returns the translations in the order of texts and the
+    hit / miss statistics.
+    """
+    texts = list(texts)
+    keys = [translation_key(text, source_lang, intermediate_lang, backend) for text in texts]
+    found = cache_get_many(connection, keys)
+
+    # One translation per distinct missing key
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in found:
+            missing.setdefault(key, text)
+    translated = dict(zip(missing, translate(list(missing.values())))) if missing else {}
+    new_translations = {key: text for key, text in translated.items() if text is not None}
+    cache_put_many(connection, new_translations)
+    evicted = evict_translation_cache(connection, max_bytes)
+
+    stats = {
+        "texts": len(texts),
+        "unique": len(set(keys)),
+        "hits": len(found),
+        "misses": len(missing),
+        "stored": len(new_translations),
+        "evicted": evicted,
+        "hit_rate": round(len(found) / max(len(set(keys)), 1), 3),
+    }
+    found.update(translated)
+    return [found.get(key) for key in keys], stats
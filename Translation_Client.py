@@ -0,0 +1,200 @@
+import asyncio
+import json
+import random
+import time
+import urllib.error
+import urllib.request
+
+
+class TranslationThrottled(Exception):
+    """
+    Raised by a backend when the service refuses a request for rate reasons (HTTP 429...).
+    retry_after: seconds the service asked to wait, when it said so.
+    """
+    def __init__(self, message="Too many requests", retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at rate tokens per second, holding at most capacity tokens.
+    """
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self):
+        """
+        Seconds until one token is available (0 when there is one).
+        """
+        self.refill()
+        return 0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    Requests per second and per minute limits (token buckets) with an adaptive (AIMD) rate:
+    a throttling error halves the per-second rate and pauses every request for the backoff,
+    each success raises it back by a small step up to the configured rate.
+    """
+    def __init__(self, requests_per_second=5, requests_per_minute=180, min_rate=0.2, backoff=2.0, max_backoff=120.0):
+        self.max_rate = requests_per_second
+        self.min_rate = min(min_rate, requests_per_second)
+        self.second = TokenBucket(requests_per_second, max(1, requests_per_second))
+        self.minute = TokenBucket(requests_per_minute / 60, requests_per_minute)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.failures = 0
+        self.paused_until = 0.0
+        self.locks = {}
+
+    def loop_lock(self):
+        """
+        Lock of the running event loop: an asyncio.Lock only works in one loop, and the same limiter is shared
+        by successive paraphrase_comments calls (each in its own asyncio.run).
+        """
+        loop = asyncio.get_running_loop()
+        if loop not in self.locks:
+            # Locks of the closed loops of the previous calls are dropped
+            self.locks = {other: lock for other, lock in self.locks.items() if not other.is_closed()}
+            self.locks[loop] = asyncio.Lock()
+        return self.locks[loop]
+
+    async def acquire(self):
+        # One request at a time takes its tokens, the others wait their turn
+        async with self.loop_lock():
+            while True:
+                wait = max(self.paused_until - time.monotonic(), self.second.wait_time(), self.minute.wait_time())
+                if wait <= 0:
+                    self.second.tokens -= 1
+                    self.minute.tokens -= 1
+                    return
+                await asyncio.sleep(wait)
+
+    def succeeded(self):
+        self.failures = 0
+        self.second.rate = min(self.max_rate, self.second.rate + self.max_rate * 0.05)
+
+    def throttled(self, retry_after=None):
+        # Multiplicative decrease and exponential backoff (with jitter), or the wait asked by the service.
+        # The requests already in flight when the service starts throttling fail together: one decrease for all of them
+        if time.monotonic() < self.paused_until:
+            return
+        self.failures += 1
+        self.second.rate = max(self.min_rate, self.second.rate / 2)
+        if retry_after is None:
+            retry_after = min(self.max_backoff, self.backoff * 2 ** (self.failures - 1)) * random.uniform(0.8, 1.2)
+        self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+
+
+def googletrans_backend(translator):
+    """
+    Backend calling a googletrans Translator (synchronous, run in a worker thread).
+    """
+    async def translate(text, src, dest):
+        try:
+            return await asyncio.to_thread(lambda: translator.translate(text, src=src, dest=dest).text)
+        except Exception as error:
+            if "429" in str(error) or "Too Many Requests" in str(error):
+                raise TranslationThrottled(str(error)) from error
+            raise
+    return translate
+
+
+def libretranslate_backend(url, api_key=None, timeout=30):
+    """
+    Backend calling a LibreTranslate-compatible HTTP API (POST {url}/translate).
+    """
+    def post(text, src, dest):
+        payload = {"q": text, "source": src, "target": dest, "format": "text"}
+        if api_key:
+            payload["api_key"] = api_key
+        request = urllib.request.Request(
+            f"{url.rstrip('/')}/translate", data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                return json.loads(response.read())["translatedText"]
+        except urllib.error.HTTPError as error:
+            if error.code in (429, 503):
+                retry_after = error.headers.get("Retry-After")
+                raise TranslationThrottled(f"HTTP {error.code}", float(retry_after) if retry_after else None) from error
+            raise
+
+    async def translate(text, src, dest):
+        return await asyncio.to_thread(post, text, src, dest)
+    return translate
+
+
+async def translate_with_limits(backend, text, src, dest, limiter, stats, timeout=30, retries=8):
+    """
+    One translation through the limiter, with a per-request timeout (None = no timeout).
+    Throttling errors slow the limiter down, other errors (timeouts included) back off this request only;
+    both are retried up to retries times. Returns None when every attempt failed.
+    """
+    for attempt in range(retries + 1):
+        await limiter.acquire()
+        stats["requests"] += 1
+        try:
+            result = await asyncio.wait_for(backend(text, src, dest), timeout)
+            limiter.succeeded()
+            return result
+        except TranslationThrottled as error:
+            stats["throttled"] += 1
+            limiter.throttled(error.retry_after)
+            last_error = error
+        except Exception as error:
+            stats["errors"] += 1
+            last_error = error
+            if attempt < retries:
+                await asyncio.sleep(min(limiter.max_backoff, limiter.backoff * 2 ** attempt))
+    print(f"Translation failed after {retries} retries: {text[:80]!r} -> {last_error!r}")
+    return None
+
+
+async def paraphrase_all(comments, backend, intermediate_lang="fr", source_lang="auto", concurrency=8, limiter=None, timeout=30, retries=8):
+    """
+    Round-trip translation (source -> intermediate language -> English) of every comment, with at most
+    concurrency comments in flight and the request rate set by the limiter. Comments already in the
+    intermediate language (source_lang == intermediate_lang) only make the way back.
+    Returns the paraphrased comments (None for failures) in the input order and the run statistics.
+    """
+    limiter = limiter or RateLimiter()
+    semaphore = asyncio.Semaphore(concurrency)
+    stats = {"comments": len(comments), "requests": 0, "throttled": 0, "errors": 0, "failed": 0}
+
+    async def paraphrase(comment):
+        async with semaphore:
+            if source_lang == intermediate_lang:
+                intermediate = comment
+            else:
+                intermediate = await translate_with_limits(backend, comment, source_lang, intermediate_lang, limiter, stats, timeout, retries)
+            if intermediate is None:
+                stats["failed"] += 1
+                return None
+            paraphrased = await translate_with_limits(backend, intermediate, intermediate_lang, "en", limiter, stats, timeout, retries)
+            stats["failed"] += paraphrased is None
+            return paraphrased
+
+    start = time.monotonic()
+    results = await asyncio.gather(*(paraphrase(comment) for comment in comments))
+    elapsed = time.monotonic() - start
+    stats["seconds"] = round(elapsed, 2)
+    stats["requests_per_second"] = round(stats["requests"] / max(elapsed, 1e-9), 2)
+    return results, stats
+
+
+def paraphrase_comments(comments, backend, **options):
+    """
+    Synchronous entry point of paraphrase_all (runs its own event loop).
+    """
+    return asyncio.run(paraphrase_all(list(comments), backend, **options))
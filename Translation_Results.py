@@ -0,0 +1,84 @@
+import csv
+import json
+import os
+
+#Append-only results of the paraphrase run: one JSON line per review {"id", "comments_cleaned", "comments_paraphrased"}
+results_file = "paraphrase_results.jsonl"
+
+
+def repair_results(path=results_file):
+    """
+    Remove a partially written last line (crash in the middle of an append), so the next batch starts on a new line.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        # Last complete line end (searched backwards by blocks)
+        end = size
+        while end > 0:
+            start = max(0, end - 65536)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline >= 0:
+                f.truncate(start + newline + 1)
+                return
+            end = start
+        f.truncate(0)
+
+
+def read_results(path=results_file):
+    """
+    Stream the records of the results file (a line that is not valid JSON, the crash case, is skipped).
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def load_done_ids(path=results_file):
+    """
+    Set of the review ids already in the results file.
+    """
+    return {record["id"] for record in read_results(path)}
+
+
+def append_results(records, path=results_file):
+    """
+    Append a completed batch in one write, flushed to disk before returning: after a crash the file holds
+    whole batches, plus at most one partial line that repair_results removes.
+    """
+    if not records:
+        return
+    text = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def assemble_results(output_file, path=results_file, columns=("id", "comments_cleaned", "comments_paraphrased")):
+    """
+    Write the results as a csv file, streamed line by line (first record of every id), returns the number of rows.
+    """
+    seen = set()
+    temporary = output_file + ".tmp"
+    with open(temporary, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(columns), extrasaction="ignore")
+        writer.writeheader()
+        for record in read_results(path):
+            if record["id"] not in seen:
+                seen.add(record["id"])
+                writer.writerow(record)
+    os.replace(temporary, output_file)
+    return len(seen)
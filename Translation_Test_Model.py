@@ -0,0 +1,54 @@
+import json
+import time
+import numpy as np
+import torch
+from Local_Translation import LocalTranslator, byte_offset
+from Translation_Client import RateLimiter, paraphrase_comments
+
+#Tiny byte-level seq2seq model to test the local translation backend without a real model: it "translates"
+#by copying its input through an identity embedding and output projection, so every round trip must give
+#back the comment. Saved as TorchScript with its language ids, the format expected by Local_Translation.py
+#Run with: python Translation_Test_Model.py
+tiny_model_file = "tiny_seq2seq.pt"
+tiny_model_languages = {"auto": 0, "en": 1, "fr": 2, "es": 3, "de": 4, "it": 5, "pt": 6}
+n_comments = 20_000
+
+
+class TinyCopyModel(torch.nn.Module):
+    """
+    forward(tokens, lengths, source, target) -> output token ids (the input tokens).
+    """
+    def __init__(self, vocabulary=256 + byte_offset):
+        super().__init__()
+        self.embedding = torch.nn.Embedding(vocabulary, vocabulary)
+        self.projection = torch.nn.Linear(vocabulary, vocabulary, bias=False)
+        with torch.no_grad():
+            self.embedding.weight.copy_(torch.eye(vocabulary))
+            self.projection.weight.copy_(torch.eye(vocabulary))
+
+    def forward(self, tokens: torch.Tensor, lengths: torch.Tensor, source: int, target: int) -> torch.Tensor:
+        return self.projection(self.embedding(tokens)).argmax(dim=-1)
+
+
+def save_tiny_model(path=tiny_model_file):
+    torch.jit.save(torch.jit.script(TinyCopyModel().eval()), path,
+                   _extra_files={"languages.json": json.dumps(tiny_model_languages)})
+    return path
+
+
+if __name__ == "__main__":
+    save_tiny_model()
+    rng = np.random.default_rng(0)
+    words = np.array("great stay location host clean apartment très propre séjour muy buena ubicación".split())
+    comments = [" ".join(rng.choice(words, size=rng.integers(1, 60))) for _ in range(n_comments)]
+    unlimited = RateLimiter(requests_per_second=float("inf"), requests_per_minute=float("inf"))
+
+    for threads in sorted({1, torch.get_num_threads()}):
+        translator = LocalTranslator(tiny_model_file, threads=threads, batch_size=64, queue_size=1024)
+        start = time.perf_counter()
+        results, stats = paraphrase_comments(comments, translator.translate, concurrency=1024, limiter=unlimited, timeout=None)
+        seconds = time.perf_counter() - start
+        assert results == comments
+        padding = translator.stats["tokens"] / translator.stats["padded_tokens"]
+        print(f"{threads} thread(s): {n_comments / seconds:,.0f} comments/s, {translator.stats['batches']} batches, "
+              f"{padding:.0%} of the batch tokens are not padding, {stats['failed']} failed")
@@ -0,0 +1,79 @@
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from Translation_Client import RateLimiter, libretranslate_backend, paraphrase_comments
+
+#Local stand-in of a LibreTranslate-compatible translation API, to test the async client without the real service:
+#it answers POST /translate after a latency, and with HTTP 429 (Retry-After) above its own request rate
+#Run with: python Translation_Test_Server.py
+server_requests_per_second = 20
+server_latency = 0.05
+n_comments = 200
+
+
+class StandInTranslationHandler(BaseHTTPRequestHandler):
+    """
+    POST /translate {q, source, target}: returns {"translatedText": "[target] q"} or HTTP 429 over the rate.
+    """
+    lock = threading.Lock()
+    window_start = 0.0
+    window_requests = 0
+
+    def allowed(self):
+        # Fixed 1 second windows of server_requests_per_second requests
+        with StandInTranslationHandler.lock:
+            now = time.monotonic()
+            if now - StandInTranslationHandler.window_start >= 1:
+                StandInTranslationHandler.window_start = now
+                StandInTranslationHandler.window_requests = 0
+            StandInTranslationHandler.window_requests += 1
+            return StandInTranslationHandler.window_requests <= server_requests_per_second
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if not self.allowed():
+            self.send_response(429)
+            self.send_header("Retry-After", "1")
+            self.end_headers()
+            return
+        time.sleep(server_latency)
+        body = json.dumps({"translatedText": f"[{payload['target']}] {payload['q']}"}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(port=0):
+    """
+    Start the stand-in server in a background thread, returns the server and its URL.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), StandInTranslationHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    server, url = start_server()
+    comments = [f"comment number {number}" for number in range(n_comments)]
+    backend = libretranslate_backend(url)
+
+    # Client limit above the server limit: the 429s must slow the client down without losing comments
+    for client_rate in [server_requests_per_second / 2, server_requests_per_second * 2]:
+        limiter = RateLimiter(requests_per_second=client_rate, requests_per_minute=client_rate * 60)
+        results, stats = paraphrase_comments(comments, backend, concurrency=16, limiter=limiter, timeout=5)
+        assert results == [f"[en] [fr] {comment}" for comment in comments]
+        print(f"Client limit {client_rate:>4.0f} req/s, server limit {server_requests_per_second} req/s: {stats}")
+
+    # One limiter shared by successive runs (each paraphrase_comments call runs its own event loop)
+    limiter = RateLimiter(requests_per_second=server_requests_per_second / 2, requests_per_minute=server_requests_per_second * 30)
+    for run in range(2):
+        results, stats = paraphrase_comments(comments[:20], backend, concurrency=8, limiter=limiter, timeout=5)
+        assert results == [f"[en] [fr] {comment}" for comment in comments[:20]]
+    print(f"Limiter shared by 2 runs: {stats}")
+    server.shutdown()